@@ -0,0 +1,80 @@
+"""Deterministic lyric corpora for the benchmarks
+
+Every corpus is generated from a fixed seed so two runs (or two machines)
+time exactly the same input.
+"""
+import random
+
+WORDS = (
+    "love night heart fire dance dream light rain road home sky soul burn "
+    "shine run fall hold time city gold wild free alone forever tonight baby "
+    "amour coeur nuit danse rêve lumière toujours encore"
+).split()
+
+CHORDS = ["A", "Am", "Bb", "C", "C#m7", "D", "Dmaj7", "Em", "F", "Fdim", "G", "Gsus4", "E7", "Bmin"]
+
+UNICODE = [
+    "été", "naïve", "coração", "straße", "ñandú", "愛", "夜空", "사랑", "любовь",
+    "حب", "שלום", "🎵", "🔥", "❤️", "étoile", "ﬁn", "Ωmega", " ",
+]
+
+
+def _line(rng, words, vocabulary=WORDS):
+    return " ".join(rng.choice(vocabulary) for _ in range(words)).capitalize()
+
+
+def realistic(rng):
+    """A Cohere-style song: short sections, 5-8 words per line, blank lines"""
+    lines = []
+    for _ in range(rng.randint(3, 5)):
+        lines.extend(_line(rng, rng.randint(5, 8)) for _ in range(4))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def long_lines(rng):
+    """Few very long lines, well past MAX_WORDS"""
+    return "\n".join(_line(rng, rng.randint(150, 300)) for _ in range(3))
+
+
+def many_lines(rng):
+    """Many short lines, well past MAX_LINES"""
+    return "\n".join(_line(rng, rng.randint(1, 3)) for _ in range(120))
+
+
+def chords(rng):
+    """Chord sheet: a chord line above every lyric line, code fences around"""
+    lines = ["```"]
+    for _ in range(16):
+        lines.append("   ".join(rng.choice(CHORDS) for _ in range(rng.randint(3, 6))))
+        lines.append(_line(rng, rng.randint(5, 8)))
+    lines.append("```")
+    return "\n".join(lines)
+
+
+def unicode_heavy(rng):
+    """Accents, CJK, RTL, emoji, combining marks and odd line separators"""
+    vocabulary = WORDS + UNICODE * 2
+    return "\r\n".join(_line(rng, rng.randint(4, 9), vocabulary) for _ in range(20))
+
+
+def empty(rng):
+    return "  \n\n\t\n"
+
+
+CORPORA = {
+    "realistic": realistic,
+    "long_lines": long_lines,
+    "many_lines": many_lines,
+    "chords": chords,
+    "unicode": unicode_heavy,
+    "empty": empty,
+}
+
+
+def build(size=50, seed=1234):
+    """{corpus name: [size sheets]}"""
+    return {
+        name: [make(random.Random(f"{seed}:{name}:{i}")) for i in range(size)]
+        for name, make in CORPORA.items()
+    }
@@ -0,0 +1,259 @@
+"""Microbenchmarks for the lyrics pipeline and the client-side generation path
+
+Text functions are timed over every corpus in corpora.py; the `client.*`
+cases time what happens around `predict` on our side (request building,
+pool/router bookkeeping, job polling, result handling) against an in-process
+fake Space that answers instantly. Results are written as JSON; pass a
+previous run to --compare to fail on regressions. Run from the repository
+root:
+
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --compare bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import Future
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import corpora  # noqa: E402
+from senorix.breaker import CircuitBreaker  # noqa: E402
+from senorix.clients import ClientPool  # noqa: E402
+from senorix.generation import audio_path, music_request  # noqa: E402
+from senorix.jobs import Job, run_gradio_job  # noqa: E402
+from senorix.lyrics import (  # noqa: E402
+    VOICE_MAP, analyze_lyrics, build_text_prompt, clean_text, enforce_limits,
+    lyrics_are_valid, prepare_lyrics, safe_lrc_structure
+)
+from senorix.music import generate_music  # noqa: E402
+from senorix.retry import RetryPolicy  # noqa: E402
+from senorix.router import Replica, ReplicaRouter  # noqa: E402
+
+TEXT_CASES = {
+    "clean_text": clean_text,
+    "enforce_limits": enforce_limits,
+    "safe_lrc_structure": safe_lrc_structure,
+    "lyrics_are_valid": lyrics_are_valid,
+    "prepare_lyrics": prepare_lyrics,
+    "analyze_lyrics": analyze_lyrics,
+}
+
+
+# ======================================================
+# FAKE SPACE
+# ======================================================
+class _Status:
+    class code:
+        name = "FINISHED"
+    rank = queue_size = eta = None
+    progress_data = None
+
+
+class _Handle(Future):
+    """Already finished gradio Job"""
+
+    def __init__(self, result):
+        super().__init__()
+        self.set_result(result)
+
+    def status(self):
+        return _Status
+
+
+class FakeSpace:
+    """gradio Client stand-in that answers every request at once"""
+
+    def __init__(self, audio):
+        self.audio = audio
+
+    def submit(self, **kwargs):
+        return _Handle(self.audio)
+
+    def predict(self, **kwargs):
+        return self.audio
+
+
+def fake_router(audio, replicas=3):
+    return ReplicaRouter([
+        Replica(f"fake-{i}",
+                ClientPool(lambda: FakeSpace(audio), max_size=4, name=f"fake-{i}"),
+                CircuitBreaker(f"fake-{i}"))
+        for i in range(replicas)
+    ])
+
+
+def client_cases(lrc, prompt):
+    """{name: zero-argument callable} for the client-side overhead"""
+    audio = os.path.abspath(__file__)
+    router = fake_router(audio)
+    pool = ClientPool(lambda: FakeSpace(audio), max_size=4, name="fake")
+    space = FakeSpace(audio)
+    request = music_request(lrc, prompt, 16, 1.3)
+    policy = RetryPolicy(max_attempts=1)
+
+    def pool_borrow():
+        with pool.borrow():
+            pass
+
+    def router_lease():
+        with router.lease():
+            pass
+
+    def gradio_job():
+        run_gradio_job(Job("bench"), space, **request)
+
+    def predict_path():
+        with router.lease() as lease:
+            audio_path(lease.client.predict(**music_request(lrc, prompt, 16, 1.3)))
+
+    def render():
+        generate_music(Job("bench"), router, lrc, prompt, 16, 1.3, policy=policy)
+
+    return {
+        "client.music_request": lambda: music_request(lrc, prompt, 16, 1.3),
+        "client.pool_borrow": pool_borrow,
+        "client.router_lease": router_lease,
+        "client.run_gradio_job": gradio_job,
+        "client.predict_path": predict_path,
+        "client.generate_music": render,
+    }
+
+
+# ======================================================
+# TIMING
+# ======================================================
+def measure(fn, repeat, min_time):
+    """Per-call seconds for each repeat, loop count calibrated to `min_time`"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - started) / loops)
+    return samples, loops
+
+
+def summarize(samples, loops, items):
+    """Microseconds per item; `min` is the figure to compare across runs"""
+    per_item = [s / items * 1e6 for s in samples]
+    return {
+        "min_us": min(per_item),
+        "median_us": statistics.median(per_item),
+        "stdev_us": statistics.stdev(per_item) if len(per_item) > 1 else 0.0,
+        "loops": loops,
+        "items": items,
+    }
+
+
+def cases(size, seed):
+    """Yield (name, callable, items per call)"""
+    corpus = corpora.build(size, seed)
+    for name, fn in TEXT_CASES.items():
+        for corpus_name, sheets in corpus.items():
+            yield f"{name}.{corpus_name}", (lambda fn=fn, sheets=sheets: [fn(s) for s in sheets]), len(sheets)
+
+    voices = list(VOICE_MAP) + ["Unknown voice"]
+    yield "build_text_prompt", (lambda: [build_text_prompt("Pop", "Happy", v) for v in voices]), len(voices)
+
+    lrc = prepare_lyrics(corpus["realistic"][0])
+    for name, fn in client_cases(lrc, build_text_prompt("Pop", "Happy", voices[0])).items():
+        yield name, fn, 1
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Names of cases whose best time grew by more than `tolerance`"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before["min_us"]:
+            continue
+        ratio = result["min_us"] / before["min_us"]
+        result["baseline_ratio"] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="previous JSON report to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown of the best time before failing")
+    parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="seconds per repeat, loop count is calibrated to it")
+    parser.add_argument("--size", type=int, default=50, help="sheets per corpus")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, fn, items in cases(args.size, args.seed):
+        if args.filter not in name:
+            continue
+        samples, loops = measure(fn, args.repeat, args.min_time)
+        results[name] = summarize(samples, loops, items)
+        print(f"{name:40s} {results[name]['min_us']:10.2f} µs", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": time.time(),
+            "size": args.size,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    failed = False
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        for name in regressions:
+            print(f"FAIL: {name} is {results[name]['baseline_ratio']:.2f}x slower", file=sys.stderr)
+        failed = bool(regressions)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
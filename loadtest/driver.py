@@ -0,0 +1,264 @@
+"""Load driver: N concurrent simulated sessions running the app's full flow
+
+Each session loops like a user of streamlit_app.py: ask Cohere for lyrics,
+prepare them, submit the render to the shared JobManager, poll the job at the
+page's rerun interval, then think before the next song. All sessions share
+one set of process-wide resources, as Streamlit sessions do. Point it at the
+fake servers (or anything speaking the same APIs):
+
+    python loadtest/fake_cohere.py --port 8600 &
+    python loadtest/fake_diffrhythm.py --port 7860 --median 20 --workers 2 &
+    python loadtest/driver.py --sessions 20 --songs 3 \\
+        --cohere-url http://127.0.0.1:8600 --space http://127.0.0.1:7860
+
+The report gives throughput and per-stage latency percentiles (lyrics,
+prepare, job queue, upstream queue, render, end to end) as text on stderr
+and JSON on stdout or --output.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from senorix.clients import ClientPool, cohere_client  # noqa: E402
+from senorix.config import (  # noqa: E402
+    HEDGE_BUDGET, HEDGE_PERCENTILE, PRIORITY_AGING, PRIORITY_TIERS, SAFE_CFG, SAFE_STEPS
+)
+from senorix.eta import EtaModel, lrc_line_count  # noqa: E402
+from senorix.generation import request_lyrics, stream_lyrics  # noqa: E402
+from senorix.hedge import Hedger  # noqa: E402
+from senorix.jobs import SUCCEEDED, JobManager  # noqa: E402
+from senorix.lyrics import VOICE_MAP, analyze_lyrics, build_text_prompt  # noqa: E402
+from senorix.music import generate_music  # noqa: E402
+from senorix.router import ReplicaRouter  # noqa: E402
+from senorix.scheduling import FairQueue, FifoQueue, PriorityQueue  # noqa: E402
+from senorix.singleflight import SingleFlight  # noqa: E402
+
+QUEUES = {
+    "fifo": FifoQueue,
+    "fair": FairQueue,
+    "sjf": lambda: PriorityQueue(tiers=PRIORITY_TIERS, aging=PRIORITY_AGING),
+}
+STAGES = ["lyrics", "prepare", "job_queue", "upstream_queue", "render", "total"]
+GENRES = ["Pop", "Rock", "Jazz", "Electronic", "Hip-Hop", "Classical", "R&B", "Country"]
+MOODS = ["Happy", "Sad", "Energetic", "Calm", "Romantic", "Dark"]
+TOPICS = ["a summer night", "leaving home", "the ocean", "a lost friend", "city lights"]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class Recorder:
+    """Thread-safe collection of per-song stage timings and outcomes"""
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.outcomes = {}
+        self._lock = threading.Lock()
+
+    def record(self, outcome, timings):
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            for stage, seconds in timings.items():
+                if seconds is not None:
+                    self.samples[stage].append(seconds)
+
+    def summary(self):
+        with self._lock:
+            stages = {}
+            for stage, values in self.samples.items():
+                if not values:
+                    continue
+                stages[stage] = {
+                    "count": len(values),
+                    "mean": sum(values) / len(values),
+                    "p50": percentile(values, 0.50),
+                    "p90": percentile(values, 0.90),
+                    "p95": percentile(values, 0.95),
+                    "p99": percentile(values, 0.99),
+                    "max": max(values),
+                }
+            return dict(self.outcomes), stages
+
+
+class Session(threading.Thread):
+    """One simulated browser session"""
+
+    def __init__(self, number, env, args, recorder):
+        super().__init__(name=f"session-{number}", daemon=True)
+        self.env = env
+        self.args = args
+        self.recorder = recorder
+        self.rng = random.Random(None if args.seed is None else args.seed + number)
+
+    def run(self):
+        for song in range(self.args.songs):
+            if song:
+                time.sleep(self.rng.expovariate(1 / self.args.think) if self.args.think else 0)
+            outcome, timings = self.song()
+            self.recorder.record(outcome, timings)
+
+    def song(self):
+        args, env = self.args, self.env
+        timings = {}
+        started = time.monotonic()
+
+        topic = self.rng.choice(TOPICS)
+        try:
+            with env["cohere_pool"].borrow() as co:
+                if args.stream:
+                    lyrics = ""
+                    for lyrics in stream_lyrics(co, topic):
+                        pass
+                else:
+                    lyrics = request_lyrics(co, topic)
+        except Exception:
+            timings["lyrics"] = time.monotonic() - started
+            return "lyrics_failed", timings
+        timings["lyrics"] = time.monotonic() - started
+
+        mark = time.monotonic()
+        sheet = analyze_lyrics(lyrics)
+        prompt = build_text_prompt(
+            self.rng.choice(GENRES), self.rng.choice(MOODS), self.rng.choice(list(VOICE_MAP))
+        )
+        timings["prepare"] = time.monotonic() - mark
+        if not sheet.valid:
+            return "invalid_lyrics", timings
+
+        manager = env["job_manager"]
+        job_id = manager.submit(
+            generate_music,
+            params={
+                "user": self.name,
+                "eta": env["eta_model"].predict(lrc_line_count(sheet.lrc), args.steps, args.cfg),
+            },
+            router=env["router"],
+            lrc=sheet.lrc,
+            prompt=prompt,
+            steps=args.steps,
+            cfg=args.cfg,
+            eta_model=env["eta_model"],
+            hedger=env["hedger"],
+            flight=env["flight"],
+        )
+        job = manager.get(job_id)
+        while not job.done:  # the page polls with st.rerun
+            time.sleep(args.poll_interval)
+        timings["total"] = time.monotonic() - started
+
+        if job.started_at is not None:
+            timings["job_queue"] = job.started_at - job.created_at
+            render_started = job.processing_started_at or job.started_at
+            if job.processing_started_at is not None:
+                timings["upstream_queue"] = max(0.0, job.processing_started_at - job.started_at)
+            timings["render"] = job.finished_at - render_started
+        ok = job.state == SUCCEEDED and job.result
+        return ("ok" if ok else "music_failed"), timings
+
+
+def build_env(args):
+    """Process-wide resources, as streamlit_app.py caches them"""
+    api_key = os.environ.get("COHERE_API_KEY", "load-test")
+    router = ReplicaRouter.from_sources(args.spaces, pool_size=args.music_pool)
+    for replica in router.replicas:
+        replica.pool.warm_async()
+    return {
+        "cohere_pool": ClientPool(
+            lambda: cohere_client(api_key, base_url=args.cohere_url),
+            max_size=args.cohere_pool,
+            name="Cohere",
+        ),
+        "router": router,
+        "hedger": (Hedger(percentile=HEDGE_PERCENTILE, budget=HEDGE_BUDGET)
+                   if args.hedging and len(args.spaces) > 1 else None),
+        "flight": SingleFlight(),
+        "job_manager": JobManager(max_workers=args.job_workers, queue=QUEUES[args.queue]()),
+        "eta_model": EtaModel(),
+    }
+
+
+def print_report(report, out=sys.stderr):
+    print(f"{report['sessions']} sessions, {report['songs']} songs in {report['duration']:.1f}s "
+          f"— {report['throughput_per_min']:.2f} songs/min", file=out)
+    print("outcomes: " + ", ".join(f"{k}={v}" for k, v in sorted(report["outcomes"].items())),
+          file=out)
+    print(f"{'stage':16s} {'count':>6s} {'mean':>8s} {'p50':>8s} {'p90':>8s} "
+          f"{'p95':>8s} {'p99':>8s} {'max':>8s}", file=out)
+    for stage in STAGES:
+        row = report["stages"].get(stage)
+        if row:
+            print(f"{stage:16s} {row['count']:6d} " + " ".join(
+                f"{row[k]:8.2f}" for k in ("mean", "p50", "p90", "p95", "p99", "max")
+            ), file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--songs", type=int, default=3, help="songs per session")
+    parser.add_argument("--think", type=float, default=5.0, help="mean seconds between songs")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds to start all sessions")
+    parser.add_argument("--cohere-url", default="http://127.0.0.1:8600")
+    parser.add_argument("--space", action="append", dest="spaces",
+                        help="gradio URL of a DiffRhythm2 replica (repeatable)")
+    parser.add_argument("--stream", action="store_true", help="stream lyrics like the live preview")
+    parser.add_argument("--steps", type=int, default=SAFE_STEPS)
+    parser.add_argument("--cfg", type=float, default=SAFE_CFG)
+    parser.add_argument("--hedging", action="store_true")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--cohere-pool", type=int, default=8)
+    parser.add_argument("--music-pool", type=int, default=8)
+    parser.add_argument("--job-workers", type=int, default=32)
+    parser.add_argument("--queue", choices=sorted(QUEUES), default="fifo",
+                        help="job queue order (as SENORIX_JOB_QUEUE in the app)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+    args.spaces = args.spaces or ["http://127.0.0.1:7860"]
+
+    env = build_env(args)
+    recorder = Recorder()
+    sessions = [Session(i, env, args, recorder) for i in range(args.sessions)]
+    started = time.monotonic()
+    for session in sessions:
+        session.start()
+        time.sleep(args.ramp / max(1, args.sessions))
+    for session in sessions:
+        session.join()
+    duration = time.monotonic() - started
+
+    outcomes, stages = recorder.summary()
+    report = {
+        "sessions": args.sessions,
+        "songs": sum(outcomes.values()),
+        "duration": duration,
+        "throughput_per_min": 60.0 * outcomes.get("ok", 0) / duration,
+        "outcomes": outcomes,
+        "stages": stages,
+        "replicas": env["router"].stats(),
+        "hedging": env["hedger"].stats() if env["hedger"] else None,
+        "coalesced": env["flight"].coalesced,
+    }
+    print_report(report)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if outcomes.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Local stand-in for the Cohere chat API (POST /v1/chat, plain and streamed)
+
+Answers with made-up lyrics after a simulated time-to-first-token plus a
+per-token delay, with a concurrency limit, a bounded waiting line and
+injected 429/500 errors. Stdlib only.
+
+    python loadtest/fake_cohere.py --port 8600 --median 2 --rate-limit-rate 0.02
+    SENORIX_COHERE_URL=http://127.0.0.1:8600 streamlit run streamlit_app.py
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import faults
+
+WORDS = (
+    "love night heart fire dance dream light rain road home sky soul burn "
+    "shine run fall hold time city gold wild free alone forever tonight"
+).split()
+
+
+def fake_lyrics(rng, lines=None):
+    lines = lines or rng.randint(10, 16)
+    return "\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 8))).capitalize()
+        for _ in range(lines)
+    )
+
+
+class CohereHandler(BaseHTTPRequestHandler):
+    server_version = "FakeCohere/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        self._json(200, {
+            "status": "ok",
+            "waiting": server.gate.waiting,
+            "rejected": server.gate.rejected,
+            "injected": server.injector.injected,
+        })
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat":
+            return self._json(404, {"message": f"no route for {self.path}"})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._json(400, {"message": "invalid JSON body"})
+
+        server = self.server
+        if not server.gate.enter():
+            return self._json(429, {"message": "too many requests"})
+        try:
+            fault = server.injector.pick()
+            if fault == "429":
+                return self._json(429, {"message": "too many requests"})
+            if fault == "500":
+                return self._json(500, {"message": "internal server error"})
+            with server.rng_lock:
+                text = fake_lyrics(server.rng)
+            if request.get("stream"):
+                self._stream(text)
+            else:
+                self._reply(text)
+        finally:
+            server.gate.leave()
+
+    def _tokens(self, text):
+        """Words with their separators, roughly what Cohere streams"""
+        token = ""
+        for char in text:
+            token += char
+            if char in " \n":
+                yield token
+                token = ""
+        if token:
+            yield token
+
+    def _response(self, text, generation_id):
+        return {
+            "text": text,
+            "generation_id": generation_id,
+            "finish_reason": "COMPLETE",
+            "chat_history": [],
+            "meta": {"billed_units": {"input_tokens": 40, "output_tokens": len(text.split())}},
+        }
+
+    def _reply(self, text):
+        server = self.server
+        tokens = len(text.split())
+        time.sleep(server.first_token.sample() + tokens * server.per_token)
+        self._json(200, self._response(text, str(uuid.uuid4())))
+
+    def _stream(self, text):
+        server = self.server
+        generation_id = str(uuid.uuid4())
+        time.sleep(server.first_token.sample())
+        self.send_response(200)
+        self.send_header("Content-Type", "application/stream+json")
+        self.end_headers()
+
+        def event(payload):
+            self.wfile.write((json.dumps(payload) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            event({"is_finished": False, "event_type": "stream-start",
+                   "generation_id": generation_id})
+            for token in self._tokens(text):
+                time.sleep(server.per_token)
+                event({"is_finished": False, "event_type": "text-generation", "text": token})
+            event({"is_finished": True, "event_type": "stream-end", "finish_reason": "COMPLETE",
+                   "response": self._response(text, generation_id)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client closed the stream early (lyrics budget reached)
+
+
+def make_server(host, port, first_token, per_token, injector, gate, rng=None, verbose=False):
+    server = ThreadingHTTPServer((host, port), CohereHandler)
+    server.daemon_threads = True
+    server.first_token = first_token
+    server.per_token = per_token
+    server.injector = injector
+    server.gate = gate
+    server.rng = rng or random.Random()
+    server.rng_lock = threading.Lock()
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--per-token", type=float, default=0.02, help="seconds per streamed token")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    faults.add_arguments(parser, median=1.0)
+    group = parser.add_argument_group("failure injection (probability per call)")
+    group.add_argument("--rate-limit-rate", type=faults.rate, default=0.0, help="HTTP 429")
+    group.add_argument("--error-rate", type=faults.rate, default=0.0, help="HTTP 500")
+    parser.set_defaults(workers=16)
+    args = parser.parse_args(argv)
+
+    rng = faults.rng_from(args)
+    server = make_server(
+        args.host, args.port,
+        faults.LatencyModel(args.median, args.sigma, cap=args.cap, rng=rng),
+        args.per_token,
+        faults.FaultInjector({"429": args.rate_limit_rate, "500": args.error_rate}, rng=rng),
+        faults.Gate(args.workers, args.max_queue),
+        rng=rng,
+        verbose=args.verbose,
+    )
+    print(f"Fake Cohere on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
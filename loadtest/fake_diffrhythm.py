@@ -0,0 +1,122 @@
+"""Local stand-in for the DiffRhythm2 Space's /infer_music gradio API
+
+Serves the same endpoint and parameters through a real gradio app, so the
+app, the batch CLI and the load driver talk to it with gradio_client exactly
+as they talk to the Hugging Face Space. Renders are silent audio after a
+simulated delay; the gradio queue provides queue positions, ETAs and
+"queue is full" rejections. Needs `pip install gradio` (not an app
+dependency).
+
+    python loadtest/fake_diffrhythm.py --port 7860 --median 30 --workers 2 \\
+        --gpu-error-rate 0.05
+    SENORIX_MUSIC_SPACES=http://127.0.0.1:7860 streamlit run streamlit_app.py
+"""
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+import wave
+
+import faults
+
+# Render time grows with steps and sung lines, like the real model
+REFERENCE_STEPS = 16
+REFERENCE_LINES = 12
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, mono: an all-zero payload decodes as silence
+MP3_FRAME = struct.pack(">I", 0xFFFB90C4) + bytes(413)
+MP3_FRAMES_PER_SECOND = 38
+
+
+def write_silence(file_type, seconds=2.0):
+    """Temporary silent audio file in the requested format"""
+    handle, path = tempfile.mkstemp(prefix="fake_diffrhythm_", suffix=f".{file_type}")
+    with os.fdopen(handle, "wb") as f:
+        if file_type == "mp3":
+            f.write(MP3_FRAME * int(seconds * MP3_FRAMES_PER_SECOND))
+            return path
+    with wave.open(path, "wb") as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(16000)
+        audio.writeframes(bytes(int(seconds * 16000) * 2))
+    return path
+
+
+def build_app(latency, injector, workers=2, max_queue=None, audio_seconds=2.0):
+    """gradio Blocks serving /infer_music with the given behaviour"""
+    import gradio as gr
+
+    def infer_music(lrc, audio_prompt, text_prompt, seed, randomize_seed, steps,
+                    cfg_strength, file_type, odeint_method, progress=gr.Progress()):
+        lines = sum(1 for line in (lrc or "").splitlines()
+                    if line.strip() and not line.startswith("["))
+        scale = (steps / REFERENCE_STEPS) * (0.5 + 0.5 * lines / REFERENCE_LINES)
+        duration = latency.sample(scale)
+        fault = injector.pick()
+        # Faults surface part-way through, as a crashed render would
+        stop_at = duration / 2 if fault else duration
+        for _ in progress.tqdm(range(int(steps)), desc="Sampling"):
+            time.sleep(stop_at / max(1, int(steps)))
+        if fault:
+            raise gr.Error(fault)
+        return write_silence(file_type or "mp3", audio_seconds)
+
+    with gr.Blocks(title="Fake DiffRhythm2") as app:
+        lrc = gr.Textbox(label="lrc", lines=10)
+        audio_prompt = gr.Audio(label="audio_prompt", type="filepath")
+        text_prompt = gr.Textbox(label="text_prompt")
+        seed = gr.Number(label="seed", value=0, precision=0)
+        randomize_seed = gr.Checkbox(label="randomize_seed", value=True)
+        steps = gr.Slider(1, 64, value=REFERENCE_STEPS, step=1, label="steps")
+        cfg_strength = gr.Slider(0.5, 5.0, value=1.3, label="cfg_strength")
+        file_type = gr.Dropdown(["mp3", "wav"], value="mp3", label="file_type")
+        odeint_method = gr.Dropdown(["euler", "midpoint", "rk4"], value="euler", label="odeint_method")
+        output = gr.Audio(label="output", type="filepath")
+        gr.Button("Generate").click(
+            infer_music,
+            inputs=[lrc, audio_prompt, text_prompt, seed, randomize_seed, steps,
+                    cfg_strength, file_type, odeint_method],
+            outputs=output,
+            api_name="infer_music",
+            concurrency_limit=workers,
+        )
+    app.queue(max_size=max_queue)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--audio-seconds", type=float, default=2.0, help="length of the silent output")
+    faults.add_arguments(parser, median=30.0)
+    group = parser.add_argument_group("failure injection (probability per render)")
+    group.add_argument("--gpu-error-rate", type=faults.rate, default=0.0,
+                       help="'CUDA out of memory' (steps down the fallback ladder)")
+    group.add_argument("--transient-error-rate", type=faults.rate, default=0.0,
+                       help="'503 Service Unavailable' (retried as is)")
+    group.add_argument("--fatal-error-rate", type=faults.rate, default=0.0,
+                       help="'Invalid LRC format' (not retried)")
+    args = parser.parse_args(argv)
+
+    rng = faults.rng_from(args)
+    app = build_app(
+        faults.LatencyModel(args.median, args.sigma, cap=args.cap, rng=rng),
+        faults.FaultInjector({
+            "CUDA out of memory": args.gpu_error_rate,
+            "503 Service Unavailable": args.transient_error_rate,
+            "Invalid LRC format": args.fatal_error_rate,
+        }, rng=rng),
+        workers=args.workers,
+        max_queue=args.max_queue,
+        audio_seconds=args.audio_seconds,
+    )
+    app.launch(server_name=args.host, server_port=args.port, show_api=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Latency and failure injection shared by the fake servers"""
+import argparse
+import math
+import random
+import threading
+
+
+class LatencyModel:
+    """Lognormal latency around `median` seconds, clamped to [floor, cap]
+
+    `sigma` is the spread of the underlying normal: 0 gives a constant,
+    0.5 a realistic tail, 1.0 a heavy one.
+    """
+
+    def __init__(self, median, sigma=0.5, floor=0.0, cap=None, rng=None):
+        self.median = median
+        self.sigma = sigma
+        self.floor = floor
+        self.cap = cap
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def sample(self, scale=1.0):
+        with self._lock:
+            value = self.median * math.exp(self.rng.gauss(0.0, self.sigma)) if self.sigma else self.median
+        value = max(self.floor, value * scale)
+        return min(value, self.cap) if self.cap is not None else value
+
+
+class FaultInjector:
+    """Draws at most one fault per request from {message: probability}"""
+
+    def __init__(self, rates, rng=None):
+        self.rates = {message: rate for message, rate in rates.items() if rate > 0}
+        if sum(self.rates.values()) > 1:
+            raise ValueError("fault probabilities add up to more than 1")
+        self.rng = rng or random.Random()
+        self.injected = {message: 0 for message in self.rates}
+        self._lock = threading.Lock()
+
+    def pick(self):
+        """Message of the fault to inject, or None"""
+        with self._lock:
+            draw = self.rng.random()
+            for message, rate in self.rates.items():
+                if draw < rate:
+                    self.injected[message] += 1
+                    return message
+                draw -= rate
+        return None
+
+
+class Gate:
+    """Concurrency limit with a bounded waiting line, like a Space queue"""
+
+    def __init__(self, workers, max_queue=None):
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+
+    def enter(self):
+        """Take a slot, waiting in line; False when the line is full"""
+        with self._lock:
+            if self.max_queue is not None and self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self.waiting -= 1
+        return True
+
+    def leave(self):
+        self._slots.release()
+
+
+def add_arguments(parser, median, sigma=0.5):
+    """Common latency/queue options for a fake server's argparse parser"""
+    group = parser.add_argument_group("latency and queueing")
+    group.add_argument("--median", type=float, default=median, help="median latency in seconds")
+    group.add_argument("--sigma", type=float, default=sigma, help="lognormal spread (0 = constant)")
+    group.add_argument("--cap", type=float, default=None, help="latency ceiling in seconds")
+    group.add_argument("--workers", type=int, default=2, help="requests served concurrently")
+    group.add_argument("--max-queue", type=int, default=None, help="waiting requests before rejecting")
+    group.add_argument("--seed", type=int, default=None, help="seed for reproducible runs")
+    return group
+
+
+def rng_from(args):
+    return random.Random(args.seed)
+
+
+def rate(value):
+    """argparse type for a probability"""
+    value = float(value)
+    if not 0 <= value <= 1:
+        raise argparse.ArgumentTypeError("expected a probability between 0 and 1")
+    return value
@@ -1,9 +1,15 @@
 import streamlit as st
-import cohere
-import re
 import time
-import traceback
-from gradio_client import Client
+from senorix.clients import ClientPool, cohere_client
+from senorix.config import (
+    FILE_TYPE, MAX_LINES, MAX_WORDS, MUSIC_SPACES, SAFE_CFG, SAFE_STEPS
+)
+from senorix.generation import request_lyrics
+from senorix.jobs import Job
+from senorix.lyrics import analyze_lyrics, lyrics_are_valid
+from senorix.lyrics import prepare_lyrics as _prepare_lyrics
+from senorix.music import generate_music
+from senorix.router import ReplicaRouter
 
 # ======================================================
 # PAGE CONFIG
@@ -17,32 +23,18 @@ st.title("🎵 Senorix AI — Stable Music Generator")
 st.caption("Lyrics → Format sécurisé → Génération musicale stable (DiffRhythm2)")
 
 # ======================================================
-# COHERE
-# ======================================================
-co = cohere.Client(st.secrets["COHERE_API_KEY"])
-MODEL_NAME = "command-a-vision-07-2025"
-
+# CLIENTS
 # ======================================================
-# DIFFRHYTHM2
-# ======================================================
-MUSIC_SPACE = "ASLP-lab/DiffRhythm2"
-MUSIC_API = "/infer_music"
-
-try:
-    music_client = Client(MUSIC_SPACE)
-    st.success("Connecté à DiffRhythm2")
-except Exception as e:
-    st.error(f"Impossible de connecter DiffRhythm2: {e}")
-    music_client = None
+@st.cache_resource
+def get_clients():
+    """Cohere and DiffRhythm2 clients, created once per process"""
+    api_key = st.secrets["COHERE_API_KEY"]
+    return (
+        ClientPool(lambda: cohere_client(api_key), name="Cohere"),
+        ReplicaRouter.from_sources(MUSIC_SPACES)
+    )
 
-# ======================================================
-# CONSTANTES
-# ======================================================
-MAX_WORDS = 220
-MAX_LINES = 20
-SAFE_STEPS = 16
-SAFE_CFG = 1.3
-FILE_TYPE = "mp3"
+cohere_pool, music_router = get_clients()
 
 # ======================================================
 # SESSION STATE
@@ -54,92 +46,18 @@ for key in ["lyrics", "audio", "generated"]:
 # ======================================================
 # UTILS
 # ======================================================
-def clean_text(text):
-    """Remove code blocks and chords"""
-    text = text.replace("```", "")
-    text = re.sub(r'\b[A-G](#|b|m|maj|min|sus|dim)?\d*\b', '', text)
-    return text.strip()
-
-def enforce_limits(text):
-    """Enforce word and line limits"""
-    words = text.split()
-    if len(words) > MAX_WORDS:
-        text = " ".join(words[:MAX_WORDS])
-        st.warning(f"Texte tronqué à {MAX_WORDS} mots")
-
-    lines = [l for l in text.splitlines() if l.strip()]
-    if len(lines) > MAX_LINES:
-        lines = lines[:MAX_LINES]
-        st.warning(f"Texte tronqué à {MAX_LINES} lignes")
-
-    return "\n".join(lines)
-
-def safe_lrc_structure(text):
-    """Create valid LRC structure for DiffRhythm2"""
-    lines = [l for l in text.splitlines() if l.strip()]
-
-    if not lines:
-        return "[start]\n[intro]\n[verse]\nEmpty song\n[chorus]\nEmpty chorus\n[outro]"
-
-    # Split into verse and chorus
-    mid = max(1, len(lines) // 2)
-    verse_lines = lines[:mid]
-    chorus_lines = lines[mid:] if mid < len(lines) else lines[:2]
-
-    # Build LRC format
-    lrc_parts = [
-        "[start]",
-        "[intro]",
-        "",
-        "[verse]"
-    ]
-    lrc_parts.extend(verse_lines)
-    lrc_parts.extend(["", "[chorus]"])
-    lrc_parts.extend(chorus_lines)
-    lrc_parts.extend(["", "[outro]"])
-    
-    return "\n".join(lrc_parts)
-
 def prepare_lyrics(text):
-    """Full preparation pipeline"""
-    text = clean_text(text)
-    text = enforce_limits(text)
-    return safe_lrc_structure(text)
-
-def lyrics_are_valid(text):
-    """Validate lyrics"""
-    if not text or not text.strip():
-        return False
-    words = text.split()
-    if len(words) < 10:
-        return False
-    if len(words) > MAX_WORDS:
-        return False
-    return True
+    """Full preparation pipeline, truncation warnings shown in the page"""
+    return _prepare_lyrics(text, warn=st.warning)
 
 # ======================================================
 # COHERE LYRICS GENERATION
 # ======================================================
 def generate_lyrics(prompt):
     """Generate lyrics with Cohere"""
-    system = """You are a professional songwriter.
-Write short emotional lyrics.
-Rules:
-- NO chords
-- MAX 2 sections (verse + chorus)
-- Simple lines
-- Emotional
-- Total: max 16 lines"""
-
     try:
-        response = co.chat(
-            model=MODEL_NAME,
-            message=f"Write a song about: {prompt}",
-            preamble=system,
-            temperature=0.7,
-            max_tokens=300
-        )
-        return response.text.strip()
+        with cohere_pool.borrow() as co:
+            return request_lyrics(co, prompt)
     except Exception as e:
         st.error(f"Erreur Cohere: {e}")
         return ""
@@ -149,10 +67,6 @@ Rules:
 # ======================================================
 def generate_music_safe(lyrics, mood, genre):
     """Generate music with detailed error handling"""
-    if not music_client:
-        st.error("Client musical non disponible")
-        return None
-
     # Prepare lyrics
     lrc = prepare_lyrics(lyrics)
     
@@ -162,81 +76,25 @@ def generate_music_safe(lyrics, mood, genre):
     
     # Build prompt
     prompt = f"{genre}, {mood}"
-    
-    st.info(f"Envoi à DiffRhythm2...")
-    st.info(f"Prompt: {prompt}")
-    st.info(f"Steps: {SAFE_STEPS}, CFG: {SAFE_CFG}")
 
+    # Synchronous run: the job only collects messages for the page
+    job = Job("prototype")
     try:
-        # First attempt with normal parameters
-        st.info("Tentative 1: Paramètres normaux...")
-        
-        result = music_client.predict(
-            lrc=lrc,
-            audio_prompt=None,
-            text_prompt=prompt,
-            seed=0,
-            randomize_seed=True,
-            steps=SAFE_STEPS,
-            cfg_strength=SAFE_CFG,
-            file_type=FILE_TYPE,
-            odeint_method="euler",
-            api_name=MUSIC_API
-        )
-        
-        st.success("Génération complétée!")
-        
-        # Debug: show result
-        with st.expander("Debug: Réponse API"):
-            st.write("Type:", type(result))
-            st.write("Contenu:", result)
-        
-        # Extract audio path
-        if isinstance(result, (list, tuple)) and len(result) > 0:
-            return result[0]
-        elif isinstance(result, str):
-            return result
-        else:
-            st.error(f"Format de réponse invalide: {type(result)}")
-            return None
-
-    except Exception as e:
-        # Show REAL error instead of hiding it
-        error_msg = str(e)
-        st.error(f"Erreur spécifique: {error_msg}")
-        
-        # Show full stack trace
-        with st.expander("Stack Trace Complet"):
-            st.code(traceback.format_exc())
-        
-        # Fallback only if GPU error
-        if "gpu" in error_msg.lower() or "memory" in error_msg.lower():
-            st.warning("Tentative avec paramètres réduits...")
-            try:
-                result = music_client.predict(
-                    lrc=lrc,
-                    audio_prompt=None,
-                    text_prompt="ambient, simple",
-                    seed=0,
-                    randomize_seed=True,
-                    steps=8,
-                    cfg_strength=1.0,
-                    file_type="mp3",
-                    odeint_method="euler",
-                    api_name=MUSIC_API
-                )
-                
-                if isinstance(result, (list, tuple)) and len(result) > 0:
-                    return result[0]
-                elif isinstance(result, str):
-                    return result
-                    
-            except Exception as e2:
-                st.error(f"Fallback échoué: {str(e2)}")
-                return None
-        else:
-            st.error("Vérifiez le format LRC dans l'expander debug ci-dessus")
-            return None
+        return generate_music(job, music_router, lrc, prompt, SAFE_STEPS, SAFE_CFG)
+    finally:
+        debug = []
+        for level, message in job.events():
+            if level == "debug":
+                debug.append(message)
+            else:
+                getattr(st, level)(message)
+        if debug:
+            with st.expander("Debug: Réponse API"):
+                for message in debug:
+                    st.write(message)
+        if job.traceback:
+            with st.expander("Stack Trace Complet"):
+                st.code(job.traceback)
 
 # ======================================================
 # UI - LYRICS GENERATION
@@ -279,16 +137,15 @@ st.session_state.lyrics = lyrics_input
 
 # Stats
 if lyrics_input:
-    words = len(lyrics_input.split())
-    lines = len([l for l in lyrics_input.splitlines() if l.strip()])
+    sheet = analyze_lyrics(lyrics_input)
     
     col_stat1, col_stat2, col_stat3 = st.columns(3)
     with col_stat1:
-        st.metric("Mots", words, delta=f"Max: {MAX_WORDS}")
+        st.metric("Mots", sheet.words, delta=f"Max: {MAX_WORDS}")
     with col_stat2:
-        st.metric("Lignes", lines, delta=f"Max: {MAX_LINES}")
+        st.metric("Lignes", sheet.lines, delta=f"Max: {MAX_LINES}")
     with col_stat3:
-        valid = "Valide" if lyrics_are_valid(lyrics_input) else "Invalide"
+        valid = "Valide" if sheet.valid else "Invalide"
         st.metric("Status", valid)
 
 # ======================================================
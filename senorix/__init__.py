@@ -0,0 +1,50 @@
+"""Senorix AI — shared building blocks for the Streamlit app and tooling
+
+Public names are resolved on first access, so `import senorix` costs almost
+nothing; the Cohere and gradio SDKs are only imported when a client is built.
+"""
+import importlib
+
+_EXPORTS = {
+    "clean_text": "senorix.lyrics",
+    "enforce_limits": "senorix.lyrics",
+    "safe_lrc_structure": "senorix.lyrics",
+    "prepare_lyrics": "senorix.lyrics",
+    "lyrics_are_valid": "senorix.lyrics",
+    "analyze_lyrics": "senorix.lyrics",
+    "analyze_many": "senorix.lyrics",
+    "score_lyrics": "senorix.lyrics",
+    "rank_lyrics": "senorix.lyrics",
+    "LyricSheet": "senorix.lyrics",
+    "build_text_prompt": "senorix.lyrics",
+    "request_lyrics": "senorix.generation",
+    "stream_lyrics": "senorix.generation",
+    "request_candidates": "senorix.generation",
+    "music_request": "senorix.generation",
+    "audio_path": "senorix.generation",
+    "generate_music": "senorix.music",
+    "ClientPool": "senorix.clients",
+    "cohere_client": "senorix.clients",
+    "gradio_client": "senorix.clients",
+    "Job": "senorix.jobs",
+    "JobManager": "senorix.jobs",
+    "SongCache": "senorix.song_cache",
+    "History": "senorix.history",
+    "AudioStore": "senorix.storage",
+    "EtaModel": "senorix.eta",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'senorix' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,245 @@
+"""Headless batch rendering of a JSONL catalogue of songs
+
+Each input line is a JSON object with either `prompt` (lyrics are written by
+Cohere) or `lyrics`, plus optional `id`, `genre`, `mood`, `voice_type`,
+`steps`, `cfg` and `seed`. Items flow through a two-stage pipeline — lyrics on
+one worker pool, music on another — so Cohere and DiffRhythm2 work overlap.
+
+Every finished stage is appended to `<out>/manifest.jsonl` right away; running
+the same command again skips rendered items and reuses lyrics that were
+already written, so a crash costs at most the items that were in flight.
+
+    python -m senorix.batch songs.jsonl --out renders/ --music-workers 2
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from senorix.clients import ClientPool, cohere_client
+from senorix.config import MUSIC_SPACES, SAFE_CFG, SAFE_STEPS
+from senorix.generation import audio_path, music_request, request_lyrics
+from senorix.lyrics import analyze_lyrics, analyze_many, build_text_prompt
+from senorix.metrics import configure_logging, span
+from senorix.router import ReplicaRouter
+
+DEFAULTS = {
+    "genre": "Pop",
+    "mood": "Happy",
+    "voice_type": "Baritone (Voix masculine moyenne)",
+    "steps": SAFE_STEPS,
+    "cfg": SAFE_CFG,
+    "seed": None,
+}
+
+
+def item_id(item):
+    """Explicit `id`, or a digest of the item so reruns recognise it"""
+    if item.get("id") is not None:
+        return str(item["id"])
+    payload = json.dumps(item, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def read_items(path):
+    """Parse the input JSONL, failing early on malformed lines"""
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise SystemExit(f"{path}:{number}: invalid JSON ({e})")
+            if not item.get("prompt") and not item.get("lyrics"):
+                raise SystemExit(f"{path}:{number}: needs 'prompt' or 'lyrics'")
+            items.append(item)
+    return items
+
+
+class Manifest:
+    """Append-only JSONL log of stage results, read back to resume"""
+
+    def __init__(self, path):
+        self.path = path
+        self.latest = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from a crash
+                    self.latest[record["id"]] = record
+
+    def is_done(self, key):
+        record = self.latest.get(key)
+        return record is not None and record["status"] == "ok"
+
+    def lyrics_for(self, key):
+        record = self.latest.get(key)
+        return record.get("lyrics") if record else None
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.latest[record["id"]] = record
+
+
+class BatchRunner:
+    """Runs items through lyrics → prepare → music with per-backend parallelism"""
+
+    def __init__(self, out_dir, cohere_pool, music_router,
+                 lyrics_workers=4, music_workers=2, prepare_processes=1, log=None):
+        self.out_dir = out_dir
+        self.cohere_pool = cohere_pool
+        self.music_router = music_router
+        self.lyrics_workers = lyrics_workers
+        self.music_workers = music_workers
+        self.prepare_processes = prepare_processes
+        self.log = log or (lambda message: print(message, file=sys.stderr))
+        os.makedirs(out_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(out_dir, "manifest.jsonl"))
+        self._sheets = {}
+        self.ok = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def run(self, items):
+        """Render every unfinished item; return the number of failures"""
+        todo = [(item_id(item), item) for item in items]
+        todo = [(key, item) for key, item in todo if not self.manifest.is_done(key)]
+        self.log(f"{len(items) - len(todo)} déjà rendus, {len(todo)} à traiter")
+
+        # Lyrics given in the input are prepared up front, in one batch
+        inline = [(key, item["lyrics"]) for key, item in todo if item.get("lyrics")]
+        sheets = analyze_many([lyrics for _, lyrics in inline], processes=self.prepare_processes)
+        self._sheets = {key: sheet for (key, _), sheet in zip(inline, sheets)}
+
+        with ThreadPoolExecutor(self.lyrics_workers, thread_name_prefix="lyrics") as lyrics_pool, \
+                ThreadPoolExecutor(self.music_workers, thread_name_prefix="music") as music_pool:
+            stage_one = [lyrics_pool.submit(self._lyrics_stage, key, item, music_pool)
+                         for key, item in todo]
+            stage_two = [future.result() for future in stage_one]
+            for future in stage_two:
+                if future is not None:
+                    future.result()
+        return self.failed
+
+    def _record(self, key, item, status, **fields):
+        record = {"id": key, "status": status, "item": item}
+        record.update(fields)
+        self.manifest.write(record)
+        if status in ("ok", "failed"):
+            with self._lock:
+                if status == "ok":
+                    self.ok += 1
+                else:
+                    self.failed += 1
+            self.log(f"[{self.ok + self.failed}] {key}: {status}"
+                     + (f" ({fields['error']})" if fields.get("error") else ""))
+
+    def _lyrics_stage(self, key, item, music_pool):
+        timings = {}
+        lyrics = item.get("lyrics") or self.manifest.lyrics_for(key)
+        if not lyrics:
+            started = time.perf_counter()
+            try:
+                with self.cohere_pool.borrow() as co:
+                    lyrics = request_lyrics(co, item["prompt"])
+            except Exception as e:
+                self._record(key, item, "failed", stage="lyrics", error=str(e))
+                return None
+            timings["lyrics"] = time.perf_counter() - started
+            self._record(key, item, "lyrics", lyrics=lyrics, timings=timings)
+
+        started = time.perf_counter()
+        with span("prepare", item=key):
+            sheet = self._sheets.pop(key, None) or analyze_lyrics(lyrics)
+        if not sheet.valid:
+            self._record(key, item, "failed", stage="prepare", lyrics=lyrics,
+                         error="invalid lyrics")
+            return None
+
+        params = dict(DEFAULTS, **{k: v for k, v in item.items() if k in DEFAULTS})
+        warnings = list(sheet.warnings)
+        lrc = sheet.lrc
+        prompt = build_text_prompt(params["genre"], params["mood"], params["voice_type"])
+        timings["prepare"] = time.perf_counter() - started
+
+        return music_pool.submit(self._music_stage, key, item, lyrics, lrc, prompt,
+                                 params, timings, warnings)
+
+    def _music_stage(self, key, item, lyrics, lrc, prompt, params, timings, warnings):
+        started = time.perf_counter()
+        fields = dict(lyrics=lyrics, lrc=lrc, text_prompt=prompt, steps=params["steps"],
+                      cfg=params["cfg"], seed=params["seed"], warnings=warnings)
+        try:
+            with self.music_router.lease() as lease, span("predict", item=key, replica=lease.replica.src):
+                result = lease.client.predict(
+                    **music_request(lrc, prompt, params["steps"], params["cfg"], params["seed"])
+                )
+            source = audio_path(result)
+            if source is None:
+                raise ValueError(f"Format de réponse invalide: {type(result)}")
+            dest = os.path.join(self.out_dir, key + os.path.splitext(source)[1])
+            with span("store", item=key):
+                shutil.copyfile(source, dest)
+        except Exception as e:
+            timings["music"] = time.perf_counter() - started
+            self._record(key, item, "failed", stage="music", error=str(e),
+                         timings=timings, **fields)
+            return
+        timings["music"] = time.perf_counter() - started
+        self._record(key, item, "ok", audio=dest, timings=timings, **fields)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m senorix.batch",
+        description="Render a JSONL catalogue of songs with Cohere + DiffRhythm2"
+    )
+    parser.add_argument("input", help="JSONL file, one song per line")
+    parser.add_argument("--out", required=True, help="output directory (audio + manifest.jsonl)")
+    parser.add_argument("--lyrics-workers", type=int, default=4, help="concurrent Cohere calls")
+    parser.add_argument("--music-workers", type=int, default=2, help="concurrent DiffRhythm2 renders")
+    parser.add_argument("--prepare-processes", type=int, default=1,
+                        help="processes for lyrics preparation (large catalogues)")
+    parser.add_argument("--space", action="append", dest="spaces",
+                        help="DiffRhythm2 Space or gradio URL (repeat for several replicas)")
+    parser.add_argument("--log-json", action="store_true",
+                        help="structured per-stage logs (JSON lines) on stderr")
+    args = parser.parse_args(argv)
+    if args.log_json:
+        configure_logging()
+
+    items = read_items(args.input)
+    api_key = os.environ.get("COHERE_API_KEY")
+
+    runner = BatchRunner(
+        args.out,
+        ClientPool(lambda: cohere_client(api_key), max_size=args.lyrics_workers,
+                   name="Cohere"),
+        ReplicaRouter.from_sources(args.spaces or MUSIC_SPACES, pool_size=args.music_workers),
+        lyrics_workers=args.lyrics_workers,
+        music_workers=args.music_workers,
+        prepare_processes=args.prepare_processes,
+    )
+    failed = runner.run(items)
+    runner.log(f"Terminé: {runner.ok} ok, {failed} échecs")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
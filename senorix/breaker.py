@@ -0,0 +1,188 @@
+"""Circuit breaker for the music backend, with a background recovery probe"""
+import threading
+import time
+from contextlib import contextmanager
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric states for the senorix_breaker_state gauge
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(RuntimeError):
+    """The backend is considered down; the call was rejected without trying"""
+
+
+class CircuitBreaker:
+    """Fail fast while a backend is down instead of waiting on its timeouts
+
+    The circuit opens after `failure_threshold` consecutive failures or
+    `slow_threshold` consecutive calls slower than `slow_call_seconds`. While
+    open every call raises CircuitOpen. It half-opens when `probe()` reports
+    the backend healthy again (see start_probe), or after `reset_timeout`
+    seconds when there is no probe; one trial call is then let through and
+    its outcome closes or re-opens the circuit.
+
+    `is_failure(exc)` decides which exceptions say the backend is unhealthy
+    (all of them by default). The others, such as a bad input or one
+    request running out of GPU memory, only show that the backend answered.
+    """
+
+    def __init__(self, name, failure_threshold=3, slow_call_seconds=240.0,
+                 slow_threshold=3, reset_timeout=60.0, probe=None,
+                 probe_interval=15.0, is_failure=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_threshold = slow_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.is_failure = is_failure
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.last_error = None
+        self.trips = 0
+        self.rejected = 0
+        self._failures = 0
+        self._slow = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    # --------------------------------------------------
+    # State transitions (lock held)
+    # --------------------------------------------------
+    def _open(self, reason):
+        if self.state != OPEN:
+            self.trips += 1
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.last_error = reason
+        self._trial_in_flight = False
+
+    def _close(self):
+        self.state = CLOSED
+        self.opened_at = None
+        self._failures = 0
+        self._slow = 0
+        self._trial_in_flight = False
+
+    # --------------------------------------------------
+    # Public API
+    # --------------------------------------------------
+    def allow(self):
+        """Raise CircuitOpen unless a call may go through now"""
+        with self._lock:
+            if self.state == OPEN and self.probe is None \
+                    and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            retry_in = self.retry_in()
+        raise CircuitOpen(
+            f"{self.name} indisponible (circuit {self.state}), réessayez dans ~{retry_in:.0f}s"
+        )
+
+    def record_success(self, duration):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._close()
+                return
+            self._failures = 0
+            if duration > self.slow_call_seconds:
+                self._slow += 1
+                if self._slow >= self.slow_threshold:
+                    self._open(f"{self._slow} appels lents (> {self.slow_call_seconds:.0f}s)")
+            else:
+                self._slow = 0
+
+    def record_failure(self, error):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open(str(error))
+                return
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open(str(error))
+
+    def record_answer(self):
+        """The backend answered with an error that is not its health's fault"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._close()
+                return
+            self._failures = 0
+
+    @contextmanager
+    def guard(self):
+        """Wrap one backend call: reject it when open, record its outcome"""
+        self.allow()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure is None or self.is_failure(e):
+                self.record_failure(e)
+            else:
+                self.record_answer()
+            raise
+        except BaseException:
+            # Cancellation says nothing about the backend's health
+            with self._lock:
+                self._trial_in_flight = False
+            raise
+        else:
+            self.record_success(time.monotonic() - started)
+
+    def retry_in(self):
+        """Seconds until the breaker may let traffic through again (rough)"""
+        if self.opened_at is None:
+            return 0.0
+        wait = self.probe_interval if self.probe else self.reset_timeout
+        return max(0.0, wait - (time.monotonic() - self.opened_at) % wait)
+
+    def start_probe(self):
+        """Start the daemon thread that half-opens the circuit on recovery"""
+        if self.probe is None or self._probe_thread is not None:
+            return
+        self._probe_thread = threading.Thread(
+            target=self._probe_loop, name=f"probe-{self.name}", daemon=True
+        )
+        self._probe_thread.start()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_interval)
+            if self.state != OPEN:
+                continue
+            try:
+                healthy = bool(self.probe())
+            except Exception as e:
+                healthy = False
+                self.last_error = str(e)
+            if healthy:
+                with self._lock:
+                    if self.state == OPEN:
+                        self.state = HALF_OPEN
+                        self._trial_in_flight = False
+
+    def stats(self):
+        """Snapshot for the UI and metrics"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "consecutive_slow": self._slow,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,185 @@
+"""Process-wide pools of long-lived API clients"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from senorix.config import COHERE_BASE_URL
+from senorix.metrics import span
+
+
+class PoolExhausted(RuntimeError):
+    """No client slot became free before the acquire timeout"""
+
+
+class ClientPool:
+    """Thread-safe pool of reusable clients with health checks and a concurrency cap
+
+    `factory` builds a new client (network handshake included). Idle clients are
+    re-checked with `health_check(client)` once they have not been verified for
+    `check_interval` seconds; a client whose borrower raised is re-checked on its
+    next checkout, or dropped when there is no health check to run.
+    """
+
+    def __init__(self, factory, max_size=4, health_check=None,
+                 check_interval=60.0, acquire_timeout=30.0, name="client"):
+        self.factory = factory
+        self.max_size = max_size
+        self.health_check = health_check
+        self.check_interval = check_interval
+        self.acquire_timeout = acquire_timeout
+        self.name = name
+        self.last_error = None
+
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = deque()  # (client, last_verified) pairs, hottest on the right
+        self._in_use = 0
+        self._created = 0
+        self._discarded = 0
+
+    # --------------------------------------------------
+    # Internals
+    # --------------------------------------------------
+    def _create(self):
+        try:
+            with span("connect", client=self.name):
+                client = self.factory()
+        except Exception as e:
+            self.last_error = e
+            raise
+        with self._lock:
+            self._created += 1
+        self.last_error = None
+        return client
+
+    def _is_healthy(self, client):
+        try:
+            return bool(self.health_check(client))
+        except Exception as e:
+            self.last_error = e
+            return False
+
+    def _discard(self, client):
+        with self._lock:
+            self._discarded += 1
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                return self._create(), time.monotonic()
+
+            client, verified = entry
+            now = time.monotonic()
+            if self.health_check is None or now - verified < self.check_interval:
+                return client, verified
+            if self._is_healthy(client):
+                return client, now
+            self._discard(client)
+
+    def _checkin(self, client, verified):
+        with self._lock:
+            self._idle.append((client, verified))
+
+    # --------------------------------------------------
+    # Public API
+    # --------------------------------------------------
+    @contextmanager
+    def borrow(self):
+        """Lend a client for the duration of the `with` block"""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PoolExhausted(
+                f"{self.name}: no free client after {self.acquire_timeout}s"
+            )
+        try:
+            client, verified = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        try:
+            yield client
+        except Exception:
+            # The failure may be the connection itself: force a re-check
+            # (or a fresh handshake) before anyone else gets this client.
+            if self.health_check is None:
+                self._discard(client)
+            else:
+                self._checkin(client, 0.0)
+            raise
+        except BaseException:
+            # Cancellation (JobCancelled, a lost hedge) says nothing about
+            # the client: give it back as it was
+            self._checkin(client, verified)
+            raise
+        else:
+            self._checkin(client, verified)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def warm(self, count=1):
+        """Make sure `count` idle clients exist; return False if connecting fails"""
+        with self._lock:
+            missing = count - len(self._idle) - self._in_use
+        for _ in range(max(0, missing)):
+            try:
+                client = self._create()
+            except Exception:
+                return False
+            self._checkin(client, time.monotonic())
+        return True
+
+    def warm_async(self, count=1):
+        """Connect in the background so the first page render never waits"""
+        threading.Thread(
+            target=self.warm, args=(count,), name=f"warm-{self.name}", daemon=True
+        ).start()
+
+    def stats(self):
+        """Snapshot of pool counters"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_size": self.max_size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "created": self._created,
+                "discarded": self._discarded,
+            }
+
+
+def cohere_client(api_key, base_url=COHERE_BASE_URL):
+    """Build a Cohere client; the SDK is imported on first use only"""
+    import cohere
+
+    if base_url:
+        return cohere.Client(api_key, base_url=base_url)
+    return cohere.Client(api_key)
+
+
+def gradio_client(src):
+    """Build a gradio client for a Space id or URL; imported on first use only"""
+    from gradio_client import Client
+
+    return Client(src)
+
+
+def gradio_space_is_healthy(client, timeout=5.0):
+    """Cheap liveness check: the Space still serves its gradio config"""
+    import httpx
+
+    url = client.src.rstrip("/") + "/config"
+    response = httpx.get(url, headers=getattr(client, "headers", None), timeout=timeout)
+    return response.status_code == 200
@@ -0,0 +1,75 @@
+"""Defaults shared by the app, the batch CLI and workers"""
+import os
+import tempfile
+
+# Cohere
+MODEL_NAME = "command-a-vision-07-2025"
+LYRICS_PREAMBLE = """You are a professional songwriter.
+Write short emotional lyrics.
+Rules:
+- NO chords
+- MAX 2 sections (verse + chorus)
+- Simple lines
+- Emotional
+- Total: max 16 lines"""
+LYRICS_TEMPERATURE = 0.7
+LYRICS_MAX_TOKENS = 300
+# Alternative Cohere API root, e.g. the local stand-in in loadtest/
+COHERE_BASE_URL = os.environ.get("SENORIX_COHERE_URL") or None
+
+# DiffRhythm2
+MUSIC_SPACE = "ASLP-lab/DiffRhythm2"
+MUSIC_API = "/infer_music"
+# Comma-separated DiffRhythm2-compatible replicas (Space ids or gradio URLs)
+MUSIC_SPACES = tuple(
+    src.strip()
+    for src in os.environ.get("SENORIX_MUSIC_SPACES", MUSIC_SPACE).split(",")
+    if src.strip()
+)
+
+# Limits and generation parameters
+MAX_WORDS = 220
+MAX_LINES = 20
+SAFE_STEPS = 16
+SAFE_CFG = 1.3
+FILE_TYPE = "mp3"
+
+# Audio downloaded by gradio_client (its own default directory): byte quota,
+# age limit for files nothing refers to, and how often the sweeper runs
+AUDIO_DIR = os.environ.get("GRADIO_TEMP_DIR") or os.path.join(tempfile.gettempdir(), "gradio")
+AUDIO_QUOTA_BYTES = int(os.environ.get("SENORIX_AUDIO_QUOTA_BYTES", str(5 * 1024 ** 3)))
+AUDIO_MAX_AGE = 24 * 3600.0
+AUDIO_SWEEP_INTERVAL = 300.0
+
+# Progressive mode: cheap draft rendered first, then the requested quality
+DRAFT_STEPS = 8
+DRAFT_CFG = 1.0
+
+# Fallback ladder: cheaper (steps, cfg) renders tried after GPU/timeout errors
+FALLBACK_LADDER = ((12, 1.2), (10, 1.0), (8, 1.0))
+MUSIC_MAX_ATTEMPTS = 5
+MUSIC_DEADLINE = 300.0  # seconds, whole request including retries
+
+# Scheduling of music jobs: per-user token bucket, queue caps, and how deep
+# the shortest upstream queue may get before we hold (defer) or refuse jobs
+USER_GENERATIONS_PER_MINUTE = 2.0
+USER_BURST = 3
+MAX_QUEUED_JOBS = 200
+MAX_QUEUED_PER_USER = 2
+UPSTREAM_DEFER_DEPTH = 10
+UPSTREAM_REJECT_DEPTH = 50
+# Seconds an upstream depth reading counts; it is only refreshed when one of
+# our requests ends, so an expired reading lets jobs through to measure again
+UPSTREAM_DEPTH_TTL = 60.0
+# Queue order: "sjf" (shortest expected job first), "fair" (users take turns)
+# or "fifo". With sjf, tier weights divide a job's expected cost and every
+# second waited counts as PRIORITY_AGING seconds less work.
+JOB_QUEUE = os.environ.get("SENORIX_JOB_QUEUE", "sjf")
+PRIORITY_TIERS = {"free": 1.0, "paid": 4.0}
+PRIORITY_AGING = 1.0
+
+# Hedging: duplicate a render on a second replica once it runs past the
+# HEDGE_PERCENTILE of recent latencies, at most HEDGE_BUDGET extra load
+HEDGING_ENABLED = os.environ.get("SENORIX_HEDGING", "0") == "1"
+HEDGE_PERCENTILE = 0.95
+HEDGE_BUDGET = 0.1
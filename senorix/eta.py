@@ -0,0 +1,125 @@
+"""Generation-time predictor learned from past DiffRhythm2 runs"""
+import json
+import os
+import tempfile
+import threading
+
+FEATURES = ("bias", "steps", "lines", "steps_x_lines", "cfg")
+
+
+def lrc_line_count(lrc):
+    """Number of sung lines in an LRC sheet produced by prepare_lyrics"""
+    return sum(1 for line in lrc.splitlines() if line.strip() and not line.startswith("["))
+
+
+def _features(lines, steps, cfg):
+    return [1.0, float(steps), float(lines), float(steps) * float(lines), float(cfg)]
+
+
+def _solve(matrix, vector):
+    """Solve a small dense linear system by Gaussian elimination with pivoting"""
+    n = len(vector)
+    a = [row[:] + [vector[i]] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        for row in range(col + 1, n):
+            factor = a[row][col] / a[col][col]
+            for k in range(col, n + 1):
+                a[row][k] -= factor * a[col][k]
+    solution = [0.0] * n
+    for row in range(n - 1, -1, -1):
+        acc = a[row][n] - sum(a[row][k] * solution[k] for k in range(row + 1, n))
+        solution[row] = acc / a[row][row]
+    return solution
+
+
+class EtaModel:
+    """Online ridge regression of render seconds on lyric length, steps and cfg
+
+    Only sufficient statistics are kept (X'X, X'y), so observing a run is
+    O(1) and the model file stays a few hundred bytes. Until `min_samples`
+    runs have been seen, predictions fall back to `prior_seconds` scaled by
+    the step count.
+    """
+
+    def __init__(self, path=None, ridge=1.0, min_samples=5,
+                 prior_seconds=60.0, prior_steps=16):
+        self.path = path
+        self.ridge = ridge
+        self.min_samples = min_samples
+        self.prior_seconds = prior_seconds
+        self.prior_steps = prior_steps
+        self._lock = threading.Lock()
+        self._reset()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _reset(self):
+        size = len(FEATURES)
+        self.samples = 0
+        self._xtx = [[0.0] * size for _ in range(size)]
+        self._xty = [0.0] * size
+        self._coef = None
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if tuple(data["features"]) != FEATURES:
+                return
+            self.samples = data["samples"]
+            self._xtx = data["xtx"]
+            self._xty = data["xty"]
+            self._coef = None
+        except (OSError, ValueError, KeyError):
+            self._reset()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".eta-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(
+                {"features": FEATURES, "samples": self.samples,
+                 "xtx": self._xtx, "xty": self._xty},
+                f,
+            )
+        os.replace(tmp, self.path)
+
+    def observe(self, lines, steps, cfg, seconds):
+        """Add one finished run to the model"""
+        x = _features(lines, steps, cfg)
+        with self._lock:
+            for i, xi in enumerate(x):
+                self._xty[i] += xi * seconds
+                for j, xj in enumerate(x):
+                    self._xtx[i][j] += xi * xj
+            self.samples += 1
+            self._coef = None
+            if self.path:
+                try:
+                    self._save()
+                except OSError:
+                    pass
+
+    def _coefficients(self):
+        if self._coef is None:
+            matrix = [row[:] for row in self._xtx]
+            for i in range(1, len(matrix)):  # leave the intercept unpenalised
+                matrix[i][i] += self.ridge
+            self._coef = _solve(matrix, self._xty)
+        return self._coef
+
+    def predict(self, lines, steps, cfg):
+        """Expected render seconds for a job (queue wait excluded)"""
+        prior = self.prior_seconds * float(steps) / self.prior_steps
+        with self._lock:
+            if self.samples < self.min_samples:
+                return prior
+            coef = self._coefficients()
+        if coef is None:
+            return prior
+        estimate = sum(c * x for c, x in zip(coef, _features(lines, steps, cfg)))
+        return max(1.0, estimate)
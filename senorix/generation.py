@@ -0,0 +1,152 @@
+"""Backend calls shared by every front end (app, batch CLI, workers)"""
+import time
+
+from senorix.config import (
+    FILE_TYPE, LYRICS_MAX_TOKENS, LYRICS_PREAMBLE, LYRICS_TEMPERATURE,
+    MAX_LINES, MAX_WORDS, MODEL_NAME, MUSIC_API
+)
+from senorix.lyrics import sung_words
+from senorix.metrics import STAGE_SECONDS, span
+
+
+def request_lyrics(co, prompt, model=MODEL_NAME, preamble=LYRICS_PREAMBLE,
+                   temperature=LYRICS_TEMPERATURE, max_tokens=LYRICS_MAX_TOKENS):
+    """Ask Cohere for song lyrics about `prompt`"""
+    with span("cohere_chat", model=model):
+        response = co.chat(
+            model=model,
+            message=f"Write a song about: {prompt}",
+            preamble=preamble,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    return response.text.strip()
+
+
+def request_candidates(pool, prompt, count, **options):
+    """`count` lyric drafts for `prompt`, requested concurrently
+
+    Each draft is its own Cohere call on a client borrowed from `pool` (a
+    ClientPool), so the wall-clock time stays close to one call. Failed
+    calls are dropped; if every call fails the last error is raised.
+    `options` go to request_lyrics.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def one():
+        with pool.borrow() as co:
+            return request_lyrics(co, prompt, **options)
+
+    texts, error = [], None
+    with span("cohere_candidates", count=count):
+        with ThreadPoolExecutor(max_workers=count, thread_name_prefix="lyrics") as executor:
+            futures = [executor.submit(one) for _ in range(count)]
+            for future in futures:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if text:
+                    texts.append(text)
+    if not texts and error is not None:
+        raise error
+    return texts
+
+
+def music_request(lrc, prompt, steps, cfg, seed=None, file_type=FILE_TYPE):
+    """Keyword arguments for DiffRhythm2's /infer_music (predict or submit)
+
+    seed=None lets the Space pick a random seed.
+    """
+    return dict(
+        lrc=lrc,
+        audio_prompt=None,
+        text_prompt=prompt,
+        seed=seed or 0,
+        randomize_seed=seed is None,
+        steps=steps,
+        cfg_strength=cfg,
+        file_type=file_type,
+        odeint_method="euler",
+        api_name=MUSIC_API
+    )
+
+
+def audio_path(result):
+    """Extract the audio file path from a DiffRhythm2 response, or None"""
+    if isinstance(result, (list, tuple)) and len(result) > 0:
+        return result[0]
+    elif isinstance(result, str):
+        return result
+    return None
+
+
+def _trim_to_budget(text, max_lines, max_words):
+    """Cut `text` at the line/word budget; return (text, budget_reached)
+
+    Only sung text counts (see sung_words): chord-only lines and code fences
+    are kept but cost nothing, as in analyze_lyrics.
+    """
+    kept = []
+    lines = 0
+    words = 0
+    for line in text.splitlines(keepends=True):
+        line_words = sung_words(line)
+        if not line_words:
+            kept.append(line)
+            continue
+        if lines == max_lines:
+            return "".join(kept).rstrip(), True
+        if words + len(line_words) > max_words:
+            tokens = []
+            for token in line.split():
+                if sung_words(token):
+                    if words == max_words:
+                        break
+                    words += 1
+                tokens.append(token)
+            kept.append(" ".join(tokens))
+            return "".join(kept).rstrip(), True
+        kept.append(line)
+        lines += 1
+        words += len(line_words)
+    return text, False
+
+
+def stream_lyrics(co, prompt, model=MODEL_NAME, preamble=LYRICS_PREAMBLE,
+                  temperature=LYRICS_TEMPERATURE, max_tokens=LYRICS_MAX_TOKENS,
+                  max_lines=MAX_LINES, max_words=MAX_WORDS):
+    """Yield the lyrics written so far as Cohere streams them
+
+    The upstream stream is closed as soon as the text goes past `max_lines`
+    or `max_words`: anything beyond would be truncated by enforce_limits, so
+    waiting for it only costs latency and tokens.
+    """
+    started = time.perf_counter()
+    with span("cohere_stream", model=model) as fields:
+        stream = co.chat_stream(
+            model=model,
+            message=f"Write a song about: {prompt}",
+            preamble=preamble,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        text = ""
+        try:
+            for event in stream:
+                if getattr(event, "event_type", None) != "text-generation":
+                    continue
+                if not text:
+                    first = time.perf_counter() - started
+                    STAGE_SECONDS.observe(first, stage="cohere_first_token", outcome="ok")
+                    fields["first_token"] = round(first, 6)
+                text, reached = _trim_to_budget(text + event.text, max_lines, max_words)
+                yield text.lstrip()
+                if reached:
+                    fields["budget_reached"] = True
+                    break
+        finally:
+            close = getattr(stream, "close", None)
+            if callable(close):
+                close()
@@ -0,0 +1,122 @@
+"""Hedged music requests: race a late request against a second replica"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from senorix.jobs import run_gradio_job
+
+
+class Hedger:
+    """Fire a duplicate request once the first one is slower than usual
+
+    The hedge delay is the `percentile` of recently observed request
+    latencies; below `min_samples` observations no hedge is sent. Hedges are
+    capped at `budget` × requests, which bounds the extra upstream load. The
+    first branch to succeed wins and the other one is cancelled upstream.
+    """
+
+    def __init__(self, percentile=0.95, budget=0.1, min_samples=20, window=200,
+                 max_workers=64, poll_interval=0.5):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.poll_interval = poll_interval
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="senorix-hedge"
+        )
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while history is too short"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return ordered[index]
+
+    def _take_budget(self):
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def _branch(self, job, router, exclude, stop, mirror, chosen, deadline, predict_kwargs):
+        with router.lease(exclude) as lease:
+            chosen.append(lease.replica.src)
+            try:
+                return run_gradio_job(
+                    job, lease.client,
+                    poll_interval=self.poll_interval,
+                    deadline=deadline,
+                    stop=stop,
+                    mirror=mirror,
+                    **predict_kwargs
+                )
+            finally:
+                if mirror:
+                    lease.report_queue(job.upstream.get("queue_size"))
+
+    def run(self, job, router, deadline=None, on_hedge=None, **predict_kwargs):
+        """Run one request, hedged if needed; return the winning result
+
+        `on_hedge(delay)` is called when the duplicate is fired.
+        """
+        with self._lock:
+            self.requests += 1
+        started = time.monotonic()
+        primary_src = []
+        branches = {}
+
+        stop = threading.Event()
+        primary = self._executor.submit(
+            self._branch, job, router, (), stop, True, primary_src, deadline, predict_kwargs
+        )
+        branches[primary] = stop
+
+        delay = self.hedge_delay()
+        if delay is not None and len(router.replicas) > 1:
+            done, _ = wait([primary], timeout=delay)
+            if not done and primary_src and self._take_budget():
+                if on_hedge is not None:
+                    on_hedge(delay)
+                stop = threading.Event()
+                backup = self._executor.submit(
+                    self._branch, job, router, tuple(primary_src), stop, False, [],
+                    deadline, predict_kwargs
+                )
+                branches[backup] = stop
+
+        pending = set(branches)
+        errors = {}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except BaseException as e:
+                    errors[future] = e
+                    continue
+                for loser in pending:
+                    branches[loser].set()
+                with self._lock:
+                    self._latencies.append(time.monotonic() - started)
+                    if future is not primary:
+                        self.hedge_wins += 1
+                return result
+        raise errors.get(primary) or next(iter(errors.values()))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "samples": len(self._latencies),
+            }
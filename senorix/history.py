@@ -0,0 +1,166 @@
+"""Persistent generation history in SQLite
+
+One row per finished render: who asked, the lyrics and prepared LRC, the
+prompt and parameters, the seed, stage timings and where the audio lives.
+Rows are indexed by user and date, by request key (everything that
+determines the audio) and by genre, and pages are read with a keyset cursor
+so deep pages cost the same as the first one.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    request_key TEXT,
+    genre TEXT,
+    mood TEXT,
+    voice_type TEXT,
+    steps INTEGER,
+    cfg REAL,
+    seed INTEGER,
+    prompt TEXT,
+    lyrics TEXT,
+    lrc TEXT,
+    audio TEXT,
+    draft INTEGER NOT NULL DEFAULT 0,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS generations_user_date ON generations (user, created_at, id);
+CREATE INDEX IF NOT EXISTS generations_user_genre_date ON generations (user, genre, created_at, id);
+CREATE INDEX IF NOT EXISTS generations_request ON generations (request_key, created_at);
+CREATE INDEX IF NOT EXISTS generations_date ON generations (created_at);
+"""
+
+COLUMNS = ("id", "user", "created_at", "request_key", "genre", "mood", "voice_type",
+           "steps", "cfg", "seed", "prompt", "lyrics", "lrc", "audio", "draft", "timings")
+
+
+def job_timings(job):
+    """Seconds spent in our queue, the upstream queue, rendering, and overall"""
+    timings = {}
+    if job.started_at is not None:
+        timings["job_queue"] = job.started_at - job.created_at
+        render_started = job.started_at
+        if job.processing_started_at is not None:
+            timings["upstream_queue"] = max(0.0, job.processing_started_at - job.started_at)
+            render_started = job.processing_started_at
+        finished = job.finished_at or time.time()
+        timings["render"] = finished - render_started
+        timings["total"] = finished - job.created_at
+    return timings
+
+
+def _entry(row):
+    entry = dict(zip(COLUMNS, row))
+    entry["draft"] = bool(entry["draft"])
+    entry["timings"] = json.loads(entry["timings"]) if entry["timings"] else {}
+    return entry
+
+
+class History:
+    """Generation history shared by every session of the process
+
+    One connection in WAL mode behind a lock: writes come from job workers,
+    reads from page reruns, and both are single-row or single-page queries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def record(self, user, lyrics, lrc, prompt, audio, request_key=None, genre=None,
+               mood=None, voice_type=None, steps=None, cfg=None, seed=None,
+               draft=False, timings=None, created_at=None):
+        """Store one generation and return its id"""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO generations (user, created_at, request_key, genre, mood,"
+                " voice_type, steps, cfg, seed, prompt, lyrics, lrc, audio, draft, timings)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (user, created_at or time.time(), request_key, genre, mood, voice_type,
+                 steps, cfg, seed, prompt, lyrics, lrc, audio, int(draft),
+                 json.dumps(timings or {})),
+            )
+            return cursor.lastrowid
+
+    def get(self, entry_id):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM generations WHERE id = ?", (entry_id,)
+            ).fetchone()
+        return _entry(row) if row else None
+
+    def page(self, user, limit=10, before=None, genre=None):
+        """Newest-first entries of `user`, at most `limit`
+
+        `before` is the cursor returned with the previous page, or None for
+        the first page. Returns (entries, cursor for the next page or None).
+        """
+        where, args = ["user = ?"], [user]
+        if genre is not None:
+            where.append("genre = ?")
+            args.append(genre)
+        if before is not None:
+            where.append("(created_at, id) < (?, ?)")
+            args.extend(before)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM generations WHERE {' AND '.join(where)}"
+                " ORDER BY created_at DESC, id DESC LIMIT ?",
+                args + [limit + 1],
+            ).fetchall()
+        entries = [_entry(row) for row in rows[:limit]]
+        cursor = None
+        if len(rows) > limit:
+            cursor = (entries[-1]["created_at"], entries[-1]["id"])
+        return entries, cursor
+
+    def find(self, request_key, user=None):
+        """Most recent final (not draft) render of `request_key` whose audio still exists"""
+        where, args = ["request_key = ?", "draft = 0"], [request_key]
+        if user is not None:
+            where.append("user = ?")
+            args.append(user)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM generations WHERE {' AND '.join(where)}"
+                " ORDER BY created_at DESC LIMIT 5",
+                args,
+            ).fetchall()
+        for row in rows:
+            entry = _entry(row)
+            if entry["audio"] and os.path.exists(entry["audio"]):
+                return entry
+        return None
+
+    def audio_paths(self):
+        """Every audio path the history refers to"""
+        with self._lock:
+            return {row[0] for row in self._db.execute(
+                "SELECT DISTINCT audio FROM generations WHERE audio IS NOT NULL"
+            )}
+
+    def count(self, user=None):
+        with self._lock:
+            if user is None:
+                return self._db.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+            return self._db.execute(
+                "SELECT COUNT(*) FROM generations WHERE user = ?", (user,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,286 @@
+"""Background generation jobs that outlive Streamlit reruns"""
+import logging
+import threading
+import time
+import traceback
+import uuid
+
+from senorix.metrics import logger, span
+from senorix.scheduling import FifoQueue
+
+PROCESSING_CODES = ("PROCESSING", "ITERATING", "PROGRESS")
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+LOG_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "success": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+
+class JobCancelled(BaseException):
+    """The job was cancelled while it was running
+
+    Like asyncio.CancelledError this is not an Exception: a cancellation must
+    not be retried, nor count as a backend failure.
+    """
+
+
+class Requeue(Exception):
+    """Raised by a follower job whose shared work is gone: queue it normally"""
+
+
+class Job:
+    """State of one background job, safe to read from any thread"""
+
+    def __init__(self, job_id, params=None):
+        self.id = job_id
+        self.params = dict(params or {})
+        self.state = PENDING
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.upstream = {}  # last status reported by the gradio job
+        self.handle = None  # gradio_client Job currently followed
+        self.processing_started_at = None  # when the Space left its queue
+        self.stage = None    # free-form label of the current phase
+        self.partial = None  # intermediate result, usable before the job ends
+        self.follower = False  # waits on work running elsewhere, outside the workers
+        self._events = []
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.state in FINAL_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def log(self, level, message):
+        """Record a message for the UI (level: info, success, warning, error, debug)
+
+        The message also goes to the "senorix" logger, tagged with the job id.
+        """
+        with self._lock:
+            self._events.append((level, message))
+        logger.log(LOG_LEVELS.get(level, logging.INFO), message,
+                   extra={"fields": {"event": "job_log", "job": self.id}})
+
+    def events(self):
+        with self._lock:
+            return list(self._events)
+
+    def attach(self, handle):
+        """Remember the upstream gradio job so it can be cancelled"""
+        self.handle = handle
+        self.upstream = {}
+        self.processing_started_at = None
+
+    def update_upstream(self, status):
+        """Mirror a gradio_client StatusUpdate"""
+        progress = None
+        for unit in getattr(status, "progress_data", None) or []:
+            if unit.progress is not None:
+                progress = unit.progress
+            elif unit.index is not None and unit.length:
+                progress = unit.index / unit.length
+        code = getattr(status, "code", None)
+        code_name = getattr(code, "name", str(code))
+        if code_name in PROCESSING_CODES and self.processing_started_at is None:
+            self.processing_started_at = time.time()
+        self.upstream = {
+            "code": code_name,
+            "rank": getattr(status, "rank", None),
+            "queue_size": getattr(status, "queue_size", None),
+            "eta": getattr(status, "eta", None),
+            "progress": progress,
+        }
+
+    def elapsed(self):
+        """Seconds spent running so far (or in total once finished)"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobManager:
+    """Process-wide registry running jobs on a bounded set of worker threads
+
+    Sessions keep only job ids; the jobs themselves, including their gradio
+    handles, live here and survive any number of reruns. Workers take jobs
+    from `queue` (FIFO by default, see senorix.scheduling for others); an
+    optional `admission` can refuse jobs at submit time and hold queued ones
+    back while the upstream is saturated. Follower jobs (see submit) wait on
+    threads of their own, so the workers stay sized for upstream capacity.
+    """
+
+    def __init__(self, max_workers=32, retention=3600.0, queue=None, admission=None,
+                 dispatch_interval=1.0):
+        self.retention = retention
+        self.queue = queue if queue is not None else FifoQueue()
+        self.admission = admission
+        self.dispatch_interval = dispatch_interval
+        self._jobs = {}
+        self._lock = threading.Lock()
+        for number in range(max_workers):
+            threading.Thread(
+                target=self._work, name=f"senorix-job-{number}", daemon=True
+            ).start()
+
+    def submit(self, fn, params=None, follow=False, **kwargs):
+        """Queue fn(job, **kwargs) and return the job id
+
+        With `follow`, the job only waits for work already running elsewhere
+        (e.g. an identical render in a SingleFlight, see job.follower): it
+        skips the queue and runs at once on its own thread, holding no
+        worker. If that work is gone by then, fn raises Requeue and the job
+        is queued like any other.
+
+        Raises senorix.scheduling.Rejected when admission control refuses it.
+        """
+        self._prune()
+        job = Job(uuid.uuid4().hex, params)
+        if self.admission is not None:
+            self.admission.admit(job, self.queue)
+        with self._lock:
+            self._jobs[job.id] = job
+        if follow:
+            job.follower = True
+            threading.Thread(
+                target=self._run, args=(job, fn, kwargs),
+                name=f"senorix-follower-{job.id[:8]}", daemon=True
+            ).start()
+        else:
+            self.queue.put(job, (fn, kwargs))
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id):
+        """1-based place of a pending job in the queue, or None"""
+        job = self.get(job_id)
+        return self.queue.position(job) if job is not None else None
+
+    def cancel(self, job_id):
+        """Cancel a queued job outright, or ask a running one to stop"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        if self.queue.remove(job):
+            job.state = CANCELLED
+            job.finished_at = time.time()
+            return True
+        handle = job.handle
+        if handle is not None:
+            try:
+                handle.cancel()
+            except Exception:
+                pass
+        return True
+
+    def jobs(self):
+        """Every job still retained, finished or not"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def active(self):
+        """Jobs that are queued or running"""
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.done]
+
+    def _work(self):
+        while True:
+            if self.admission is not None and not self.admission.may_dispatch():
+                time.sleep(self.dispatch_interval)
+                continue
+            item = self.queue.get(timeout=self.dispatch_interval)
+            if item is not None:
+                job, (fn, kwargs) = item
+                self._run(job, fn, kwargs)
+
+    def _run(self, job, fn, kwargs):
+        if job.cancel_requested:
+            job.state = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.state = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, **kwargs)
+            job.state = SUCCEEDED
+        except JobCancelled:
+            job.state = CANCELLED
+        except Requeue:
+            job.follower = False
+            job.state = PENDING
+            job.started_at = None
+            self.queue.put(job, (fn, kwargs))
+        except Exception as e:
+            if job.cancel_requested:
+                job.state = CANCELLED
+                return
+            job.error = e
+            job.traceback = traceback.format_exc()
+            job.state = FAILED
+        finally:
+            if job.state != PENDING:
+                job.finished_at = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            stale = [
+                job_id for job_id, job in self._jobs.items()
+                if job.done and (job.finished_at or 0) < cutoff
+            ]
+            for job_id in stale:
+                del self._jobs[job_id]
+
+
+def run_gradio_job(job, client, poll_interval=0.5, deadline=None, stop=None,
+                   mirror=True, **predict_kwargs):
+    """Submit a gradio job and follow it to completion, mirroring its status on `job`
+
+    `deadline` is an optional time.monotonic() instant after which the
+    upstream job is cancelled and TimeoutError raised. Setting the optional
+    `stop` event cancels this upstream job only (JobCancelled is raised), and
+    mirror=False leaves `job`'s handle and status alone — both used when
+    several upstream jobs race for one Job.
+    """
+    stop = stop or job._cancel
+    with span("predict", job=job.id, steps=predict_kwargs.get("steps")):
+        handle = client.submit(**predict_kwargs)
+        if mirror:
+            job.attach(handle)
+        while not handle.done():
+            if job.cancel_requested or stop.is_set():
+                handle.cancel()
+                raise JobCancelled()
+            if deadline is not None and time.monotonic() >= deadline:
+                handle.cancel()
+                raise TimeoutError("DiffRhythm2 job exceeded the request deadline")
+            if mirror:
+                job.update_upstream(handle.status())
+            stop.wait(poll_interval)
+        if job.cancel_requested or stop.is_set():
+            raise JobCancelled()
+        if mirror:
+            job.update_upstream(handle.status())
+        return handle.result()
@@ -0,0 +1,216 @@
+"""Lyrics preprocessing: cleaning, limits and LRC formatting for DiffRhythm2
+
+`analyze_lyrics` runs the whole pipeline in one go over the input text and
+returns a LyricSheet (editor stats, validity, cleaned lines and LRC);
+`analyze_many` does the same for thousands of sheets. The step-by-step
+functions below produce exactly the same text.
+"""
+import re
+
+from senorix.config import MAX_LINES, MAX_WORDS
+
+VOICE_MAP = {
+    "Baritone (Voix masculine moyenne)": "male baritone vocals",
+    "Baritenor (Voix masculine medium-haute)": "male baritenor vocals",
+    "Bass (Voix masculine grave)": "male bass vocals, deep voice",
+    "Tenor (Voix masculine haute)": "male tenor vocals, high male voice",
+    "Mezzosoprano (Voix féminine moyenne)": "female mezzo-soprano vocals",
+    "Soprano (Voix féminine haute)": "female soprano vocals, high female voice",
+    "Contralto (Voix féminine grave)": "female contralto vocals, low female voice"
+}
+
+CHORD_PATTERN = re.compile(r'\b[A-G](#|b|m|maj|min|sus|dim)?\d*\b')
+EMPTY_LRC = "[start]\n[intro]\n[verse]\nEmpty song\n[chorus]\nEmpty chorus\n[outro]"
+
+
+def clean_text(text):
+    """Remove code blocks and chords"""
+    text = text.replace("```", "")
+    text = CHORD_PATTERN.sub('', text)
+    return text.strip()
+
+
+def sung_words(text):
+    """Words of `text` that DiffRhythm2 will sing (no chords, no code fences)
+
+    The unit of the MAX_WORDS/MAX_LINES budget: analyze_lyrics and the
+    streamed lyrics count the same way.
+    """
+    return CHORD_PATTERN.sub("", text.replace("```", "")).split()
+
+
+def enforce_limits(text, warn=None):
+    """Enforce word and line limits
+
+    `warn` receives a message whenever the text gets truncated.
+    """
+    words = text.split()
+    if len(words) > MAX_WORDS:
+        text = " ".join(words[:MAX_WORDS])
+        if warn:
+            warn(f"Texte tronqué à {MAX_WORDS} mots")
+
+    lines = [l for l in text.splitlines() if l.strip()]
+    if len(lines) > MAX_LINES:
+        lines = lines[:MAX_LINES]
+        if warn:
+            warn(f"Texte tronqué à {MAX_LINES} lignes")
+
+    return "\n".join(lines)
+
+
+def safe_lrc_structure(text):
+    """Create valid LRC structure for DiffRhythm2"""
+    return _lrc([l for l in text.splitlines() if l.strip()])
+
+
+def _lrc(lines):
+    """LRC sheet from non-blank lyric lines"""
+    if not lines:
+        return EMPTY_LRC
+
+    # Split into verse and chorus
+    mid = max(1, len(lines) // 2)
+    verse_lines = lines[:mid]
+    chorus_lines = lines[mid:] if mid < len(lines) else lines[:2]
+
+    # Build LRC format
+    lrc_parts = [
+        "[start]",
+        "[intro]",
+        "",
+        "[verse]"
+    ]
+    lrc_parts.extend(verse_lines)
+    lrc_parts.extend(["", "[chorus]"])
+    lrc_parts.extend(chorus_lines)
+    lrc_parts.extend(["", "[outro]"])
+
+    return "\n".join(lrc_parts)
+
+
+def prepare_lyrics(text, warn=None):
+    """Full preparation pipeline"""
+    sheet = analyze_lyrics(text)
+    if warn:
+        for message in sheet.warnings:
+            warn(message)
+    return sheet.lrc
+
+
+class LyricSheet:
+    """Everything the app needs to know about one lyric sheet
+
+    `words`, `lines` and `valid` describe the raw input (editor stats,
+    lyrics_are_valid); `text`, `sung_lines` and `lrc` are what prepare_lyrics
+    sends to DiffRhythm2, with `warnings` listing the truncations applied.
+    """
+
+    __slots__ = ("words", "lines", "valid", "text", "sung_lines", "lrc", "warnings")
+
+    def __init__(self, words, lines, valid, sung_lines, warnings):
+        self.words = words
+        self.lines = lines
+        self.valid = valid
+        self.sung_lines = sung_lines
+        self.text = "\n".join(sung_lines)
+        self.lrc = _lrc(sung_lines)
+        self.warnings = warnings
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+def analyze_lyrics(text):
+    """clean_text + enforce_limits + safe_lrc_structure + stats in one go
+
+    The chord pattern runs once over the whole text and every split happens
+    once; the whole-text strip of clean_text only trims the first and last
+    kept lines, since blank lines are dropped anyway.
+    """
+    text = text or ""
+    words = len(text.split())
+    lines = sum(1 for line in text.splitlines() if line and not line.isspace())
+
+    cleaned = CHORD_PATTERN.sub("", text.replace("```", ""))
+    sung_words = len(cleaned.split())
+    sung_lines = [line for line in cleaned.splitlines() if line and not line.isspace()]
+
+    warnings = []
+    if sung_words > MAX_WORDS:
+        # enforce_limits flattens the first MAX_WORDS words onto one line
+        sung_lines = [" ".join(cleaned.split()[:MAX_WORDS])]
+        warnings.append(f"Texte tronqué à {MAX_WORDS} mots")
+    elif sung_lines:
+        sung_lines[0] = sung_lines[0].lstrip()
+        sung_lines[-1] = sung_lines[-1].rstrip()
+        if len(sung_lines) > MAX_LINES:
+            del sung_lines[MAX_LINES:]
+            warnings.append(f"Texte tronqué à {MAX_LINES} lignes")
+
+    valid = 10 <= words <= MAX_WORDS
+    return LyricSheet(words, lines, valid, sung_lines, warnings)
+
+
+def analyze_many(texts, processes=None, chunksize=256):
+    """analyze_lyrics over an iterable of sheets, in order
+
+    With `processes` > 1 the work is spread over a process pool in chunks,
+    which pays off from a few thousand sheets on.
+    """
+    if not processes or processes <= 1:
+        return [analyze_lyrics(text) for text in texts]
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(analyze_lyrics, texts, chunksize=chunksize))
+
+
+def lyrics_are_valid(text):
+    """Validate lyrics"""
+    if not text or not text.strip():
+        return False
+    words = text.split()
+    if len(words) < 10:
+        return False
+    if len(words) > MAX_WORDS:
+        return False
+    return True
+
+
+def score_lyrics(text):
+    """Rank a lyric candidate: (score, sheet), higher is better
+
+    Valid lyrics always beat invalid ones. Then each truncation costs 10
+    points, chords and code fences removed by clean_text cost up to 20 in
+    proportion to the words lost, and filling the line and word budgets
+    earns up to 10.
+    """
+    sheet = analyze_lyrics(text)
+    score = 100.0 if sheet.valid else 0.0
+    score -= 10.0 * len(sheet.warnings)
+    if sheet.words:
+        residue = sheet.words - len(clean_text(text).split())
+        score -= 20.0 * residue / sheet.words
+    sung_words = len(sheet.text.split())
+    score += 5.0 * min(len(sheet.sung_lines), MAX_LINES) / MAX_LINES
+    score += 5.0 * min(sung_words, MAX_WORDS) / MAX_WORDS
+    return score, sheet
+
+
+def rank_lyrics(texts):
+    """[(score, text, sheet)] best first; ties keep the given order"""
+    scored = [(*score_lyrics(text), index, text) for index, text in enumerate(texts)]
+    scored.sort(key=lambda item: (-item[0], item[2]))
+    return [(score, text, sheet) for score, sheet, _, text in scored]
+
+
+def build_text_prompt(genre, mood, voice_type):
+    """Build text prompt with voice type"""
+    voice_desc = VOICE_MAP.get(voice_type, "vocals")
+
+    return f"{genre}, {voice_desc}, {mood}"
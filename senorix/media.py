@@ -0,0 +1,181 @@
+"""Static media endpoint that streams generated audio straight from disk
+
+Streamlit's st.audio/st.download_button copy whole files into the session on
+every rerun. Instead the page embeds a URL to this server, which sends the
+file with sendfile(2) (chunked copy as fallback), honours Range requests for
+seeking and lets the browser cache it.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+CHUNK_SIZE = 256 * 1024
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def content_disposition(name):
+    """Attachment header for a user-visible file name
+
+    The plain `filename` is reduced to a safe ASCII charset and the exact
+    name goes in RFC 5987 `filename*`; control characters (CR/LF included)
+    are dropped first, so the value can never break out of the header.
+    """
+    name = "".join(char for char in name if char.isprintable())[:200]
+    fallback = _UNSAFE_FILENAME.sub("_", name).strip(".") or "download"
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(name, safe='')}"
+
+
+def _token(real_path):
+    return hashlib.sha256(real_path.encode("utf-8")).hexdigest()[:32]
+
+
+class MediaServer:
+    """Serves registered files only, addressed by opaque tokens rather than paths
+
+    At most `max_files` registrations are kept, least recently registered
+    dropped first; pages re-register what they show on each rerun.
+    """
+
+    def __init__(self, host="0.0.0.0", port=8502, public_url=None, max_age=86400,
+                 on_serve=None, max_files=10000):
+        self.host = host
+        self.port = port
+        self.public_url = (public_url or f"http://localhost:{port}").rstrip("/")
+        self.max_age = max_age
+        self.on_serve = on_serve  # called with the path of each file sent from its start
+        self.bytes_sent = 0
+        self.max_files = max_files
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def start(self):
+        """Bind and serve on a daemon thread (raises OSError if the port is taken)"""
+        server = self
+
+        class Handler(_MediaHandler):
+            media = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(
+            target=self._httpd.serve_forever, name="senorix-media", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def url_for(self, path, download_name=None):
+        """Register `path` and return the URL the browser should load"""
+        real = os.path.realpath(path)
+        token = _token(real)
+        with self._lock:
+            self._files[token] = real
+            self._files.move_to_end(token)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+        url = f"{self.public_url}/media/{token}{os.path.splitext(real)[1]}"
+        if download_name:
+            url += "?download=" + quote(download_name)
+        return url
+
+    def forget(self, path):
+        """Stop serving `path` (e.g. once it has been deleted)"""
+        real = os.path.realpath(path)
+        token = _token(real)
+        with self._lock:
+            self._files.pop(token, None)
+
+    def resolve(self, token):
+        with self._lock:
+            return self._files.get(token)
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    media = None  # set on the per-server subclass
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _serve(self, head):
+        url = urlsplit(self.path)
+        match = re.fullmatch(r"/media/([0-9a-f]{32})(\.\w+)?", url.path)
+        path = self.media.resolve(match.group(1)) if match else None
+        if path is None or not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        stat = os.stat(path)
+        size = stat.st_size
+        # Not the mtime: on_serve may bump it (LRU) without changing the content
+        etag = f'"{stat.st_ino:x}-{size:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, size - 1
+        status = 200
+        requested = self.headers.get("Range")
+        if requested and size:
+            parsed = _RANGE.match(requested.strip())
+            if parsed and (parsed.group(1) or parsed.group(2)):
+                if parsed.group(1):
+                    start = int(parsed.group(1))
+                    end = min(int(parsed.group(2)), size - 1) if parsed.group(2) else size - 1
+                else:  # suffix range: last N bytes
+                    start = max(0, size - int(parsed.group(2)))
+                if start > end:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = 206
+        length = max(0, end - start + 1)
+
+        self.send_response(status)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(stat.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", f"public, max-age={self.media.max_age}")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        download = parse_qs(url.query).get("download")
+        if download:
+            self.send_header("Content-Disposition", content_disposition(download[0]))
+        self.end_headers()
+        if head or not length:
+            return
+        if start == 0 and self.media.on_serve is not None:
+            self.media.on_serve(path)
+
+        self.wfile.flush()
+        with open(path, "rb") as f:
+            try:
+                sent = self.connection.sendfile(f, start, length)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+        self.media.bytes_sent += sent
@@ -0,0 +1,277 @@
+"""Process-wide metrics, timing spans and structured logs
+
+Metrics live in one registry per process (REGISTRY) and are rendered in the
+Prometheus text format by MetricsServer, so every session's work shows up in
+one scrape. `span()` times a stage into the `senorix_stage_seconds` histogram
+and writes one JSON log line per span through the "senorix" logger.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 120.0, 300.0)
+
+logger = logging.getLogger("senorix")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._function = None
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def set_function(self, fn):
+        """Read the value(s) at scrape time: fn() returns a number, or
+        {label values tuple: number} for a labelled metric"""
+        self._function = fn
+        return self
+
+    def samples(self):
+        """[(suffix, label values, extra label pairs, value)]"""
+        if self._function is not None:
+            value = self._function()
+            if not isinstance(value, dict):
+                value = {(): value}
+            return [("", tuple(str(v) for v in key), (), number) for key, number in value.items()]
+        with self._lock:
+            return [("", key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labels, key, extra)} {value:g}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def count(self, **labels):
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[1] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), count, total)
+                      for key, (counts, count, total) in self._values.items()]
+        samples = []
+        for key, counts, count, total in values:
+            for bound, cumulative in zip(self.buckets, counts):
+                samples.append(("_bucket", key, (("le", f"{bound:g}"),), cumulative))
+            samples.append(("_bucket", key, (("le", "+Inf"),), count))
+            samples.append(("_count", key, (), count))
+            samples.append(("_sum", key, (), total))
+        return samples
+
+
+class Registry:
+    """Named metrics; asking twice for a name returns the same metric"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        blocks = []
+        for metric in metrics:
+            try:
+                blocks.append(metric.render())
+            except Exception as e:  # a broken callback must not hide the rest
+                logger.warning("metric %s failed: %s", metric.name, e)
+        return "\n".join(blocks) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "senorix_stage_seconds", "Time spent per pipeline stage", ("stage", "outcome")
+)
+RETRIES = REGISTRY.counter(
+    "senorix_retries_total", "Music attempts retried, by error class", ("category",)
+)
+FALLBACKS = REGISTRY.counter(
+    "senorix_fallbacks_total", "Retries that stepped down the steps/cfg ladder"
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "senorix_cache_requests_total", "Cache lookups", ("cache", "result")
+)
+
+
+@contextmanager
+def span(stage, level=logging.INFO, **fields):
+    """Time the `with` block as `stage` and log it as one JSON line
+
+    The outcome label is ok, error or cancelled (BaseException such as
+    JobCancelled). Yields a dict the block may add log fields to; per-rerun
+    UI stages pass level=logging.DEBUG to stay out of the default log.
+    """
+    extra = dict(fields)
+    started = time.perf_counter()
+    outcome = "cancelled"
+    try:
+        yield extra
+        outcome = "ok"
+    except Exception as e:
+        outcome = "error"
+        extra.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage, outcome=outcome)
+        if logger.isEnabledFor(level):
+            extra.update(event="span", stage=stage, outcome=outcome, seconds=round(seconds, 6))
+            logger.log(level, stage, extra={"fields": extra})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the record's `fields` merged in"""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        payload.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(level="INFO", stream=None):
+    """Send the "senorix" logger to `stream` (stderr) as JSON lines, once"""
+    if not any(isinstance(h.formatter, JsonFormatter) for h in logger.handlers):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+class MetricsServer:
+    """GET /metrics for Prometheus (or curl), served on a daemon thread"""
+
+    def __init__(self, host="0.0.0.0", port=9464, registry=REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._httpd = None
+
+    def start(self):
+        """Bind and serve (raises OSError if the port is taken)"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(
+            target=self._httpd.serve_forever, name="senorix-metrics", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
@@ -0,0 +1,233 @@
+"""DiffRhythm2 rendering with song cache, ETA learning and a fallback ladder"""
+import hashlib
+import json
+import random
+import time
+import traceback
+
+from senorix.breaker import CircuitOpen
+from senorix.config import (
+    DRAFT_CFG, DRAFT_STEPS, FALLBACK_LADDER, FILE_TYPE, MUSIC_DEADLINE,
+    MUSIC_MAX_ATTEMPTS
+)
+from senorix.eta import lrc_line_count
+from senorix.generation import audio_path, music_request
+from senorix.jobs import JobCancelled, Requeue, run_gradio_job
+from senorix.metrics import CACHE_REQUESTS, span
+from senorix.retry import RetryPolicy, fallback_ladder, run_with_fallback
+
+
+def default_policy():
+    """Retry policy built from the configured attempt budget and deadline"""
+    return RetryPolicy(max_attempts=MUSIC_MAX_ATTEMPTS, deadline=MUSIC_DEADLINE)
+
+
+def request_key(lrc, prompt, steps, cfg, seed=None, file_type=FILE_TYPE):
+    """Identity of a render request; random-seed requests share one key
+
+    Also the SongCache key of fixed-seed renders and the history's request key.
+    """
+    payload = json.dumps(
+        [lrc, prompt, int(steps), round(float(cfg), 3), file_type,
+         "random" if seed is None else int(seed)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def generate_music(job, router, lrc, prompt, steps, cfg, seed=None,
+                   song_cache=None, eta_model=None, policy=None,
+                   ladder=FALLBACK_LADDER, hedger=None, flight=None,
+                   poll_interval=0.5):
+    """Generate music, sharing an identical in-flight render when possible
+
+    With a `flight` (a process-wide SingleFlight), requests with the same
+    lyrics, prompt and parameters attach to the render already running for
+    another session and receive its result instead of submitting their own.
+    A follower job (submitted with JobManager.submit(follow=True)) never
+    renders itself: with nothing left to follow it raises Requeue, to get a
+    worker first. See _render for the rest.
+    """
+    if flight is None:
+        return _render(job, router, lrc, prompt, steps, cfg, seed, song_cache,
+                       eta_model, policy, ladder, hedger)
+
+    key = request_key(lrc, prompt, steps, cfg, seed)
+    while True:
+        if job.follower:
+            shared, leader = flight.follow(key), False
+            if shared is None:
+                raise Requeue()
+        else:
+            shared, leader = flight.join(key, owner=job)
+        if leader:
+            try:
+                audio = _render(job, router, lrc, prompt, steps, cfg, seed, song_cache,
+                                eta_model, policy, ladder, hedger)
+            except BaseException as e:
+                flight.complete(key, error=e)
+                raise
+            flight.complete(key, audio)
+            return audio
+
+        job.log("info", "Génération identique déjà en cours — résultat partagé")
+        leader_job = shared.owner
+        while not shared.done():
+            if job.cancel_requested:
+                raise JobCancelled()
+            # Show the leader's real progress on this session's job
+            job.upstream = leader_job.upstream
+            job.processing_started_at = leader_job.processing_started_at
+            job._cancel.wait(poll_interval)
+        try:
+            audio = shared.result()
+        except JobCancelled:
+            # The leader's own user cancelled: render for ourselves instead
+            job.log("warning", "Génération partagée annulée, nouvelle tentative...")
+            continue
+        except Exception as e:
+            job.log("error", f"Erreur spécifique: {e}")
+            return None
+        if audio is None:
+            job.log("error", "La génération partagée a échoué")
+        else:
+            job.log("success", "Génération complétée!")
+        return audio
+
+
+def generate_progressive(job, router, lrc, prompt, steps, cfg, seed=None,
+                         draft_steps=DRAFT_STEPS, draft_cfg=DRAFT_CFG, **options):
+    """Render a cheap draft, publish it as `job.partial`, then the full song
+
+    Both renders share one seed so the final version is the draft's song at
+    full quality. When none is given it is drawn here and stored in
+    `job.params["seed"]`, and the renders skip the song cache: nobody will
+    ask for that seed unless they reuse it. Cancelling the job after the
+    draft stops the full render and leaves the draft in `job.partial`.
+    `options` are passed to generate_music.
+    """
+    if seed is None:
+        seed = job.params["seed"] = random.randrange(2 ** 31)
+        options = dict(options, song_cache=None)
+
+    job.stage = "draft"
+    job.log("info", f"Brouillon rapide (steps={draft_steps}, CFG={min(draft_cfg, cfg)})...")
+    draft = generate_music(job, router, lrc, prompt, draft_steps, min(draft_cfg, cfg),
+                           seed=seed, **options)
+    if draft:
+        job.partial = draft
+        job.log("success", "Brouillon prêt — rendu final en cours")
+    else:
+        job.log("warning", "Brouillon indisponible, rendu final direct")
+
+    job.stage = "final"
+    return generate_music(job, router, lrc, prompt, steps, cfg, seed=seed, **options)
+
+
+def _render(job, router, lrc, prompt, steps, cfg, seed, song_cache, eta_model,
+            policy, ladder, hedger):
+    """Generate music with detailed error handling
+
+    Progress and errors are reported through `job.log` so any front end can
+    replay them. Failures are classified: GPU and timeout errors step down
+    the `ladder` of cheaper steps/cfg settings, queue-full and transient
+    errors are retried with jittered backoff, all within the policy's
+    deadline. The user's prompt is kept on every attempt. Each attempt runs
+    on the replica `router` picks; when every replica's circuit is open the
+    job fails at once. With a `hedger`, a slow attempt is duplicated on a
+    second replica and the first result wins.
+
+    A fixed `seed` makes the render reproducible, which is what allows
+    `song_cache` to answer repeats; seed=None keeps DiffRhythm2's random
+    seed. Returns the audio path, or None when generation failed.
+    """
+    job.log("info", "Envoi à DiffRhythm2...")
+    job.log("info", f"Prompt: {prompt}")
+    job.log("info", f"Steps: {steps}, CFG: {cfg}")
+
+    cache_key = None
+    if seed is not None and song_cache is not None:
+        cache_key = request_key(lrc, prompt, steps, cfg, seed)
+        cached = song_cache.get(cache_key)
+        CACHE_REQUESTS.inc(cache="song", result="hit" if cached else "miss")
+        if cached:
+            job.log("success", "Chanson trouvée dans le cache")
+            return cached
+
+    def on_hedge(delay):
+        job.log("info", f"Relance en parallèle sur une autre réplique (> {delay:.0f}s)...")
+
+    def attempt(attempt_steps, attempt_cfg, deadline):
+        request = music_request(lrc, prompt, attempt_steps, attempt_cfg, seed)
+        submitted_at = time.time()
+        if hedger is not None:
+            result = hedger.run(job, router, deadline=deadline, on_hedge=on_hedge, **request)
+        else:
+            with router.lease() as lease:
+                try:
+                    result = run_gradio_job(job, lease.client, deadline=deadline, **request)
+                finally:
+                    lease.report_queue(job.upstream.get("queue_size"))
+
+        # Learn render time (queue wait excluded) for future ETAs
+        if eta_model is not None:
+            started = job.processing_started_at or submitted_at
+            eta_model.observe(lrc_line_count(lrc), attempt_steps, attempt_cfg,
+                              time.time() - started)
+        return result, attempt_steps, attempt_cfg
+
+    def on_retry(error, category, number, next_steps, next_cfg, delay):
+        job.log("error", f"Erreur spécifique ({category}): {error}")
+        job.traceback = "".join(
+            traceback.format_exception(type(error), error, error.__traceback__)
+        )
+        job.log(
+            "warning",
+            f"Tentative {number}: steps={next_steps}, CFG={next_cfg} dans {delay:.1f}s..."
+        )
+
+    try:
+        # First attempt with normal parameters
+        job.log("info", "Tentative 1: Paramètres normaux...")
+        result, used_steps, used_cfg = run_with_fallback(
+            attempt,
+            fallback_ladder(steps, cfg, ladder),
+            policy or default_policy(),
+            on_retry=on_retry,
+            sleep=job._cancel.wait
+        )
+    except JobCancelled:
+        raise
+    except CircuitOpen as e:
+        job.log("error", f"⛔ {e}")
+        return None
+    except Exception as e:
+        # Show REAL error instead of hiding it
+        job.log("error", f"Erreur spécifique: {e}")
+        job.traceback = traceback.format_exc()
+        job.log("error", "Vérifiez le format LRC dans l'expander debug ci-dessus")
+        return None
+
+    if job.cancel_requested:
+        raise JobCancelled()
+
+    job.log("success", "Génération complétée!")
+
+    # Debug: show result
+    job.log("debug", f"Type: {type(result)}")
+    job.log("debug", f"Contenu: {result}")
+
+    # Extract audio path
+    audio = audio_path(result)
+    if audio is None:
+        job.log("error", f"Format de réponse invalide: {type(result)}")
+        return None
+
+    # Only a render with the requested settings may answer future repeats
+    if cache_key and (used_steps, used_cfg) == (steps, cfg):
+        try:
+            with span("store", job=job.id):
+                audio = song_cache.put(cache_key, audio)
+        except OSError as e:
+            job.log("warning", f"Cache indisponible: {e}")
+    return audio
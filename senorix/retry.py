@@ -0,0 +1,124 @@
+"""Error classification and the steps/cfg fallback ladder for DiffRhythm2"""
+import random
+import time
+
+from senorix.jobs import JobCancelled
+from senorix.metrics import FALLBACKS, RETRIES
+
+# Error classes
+GPU = "gpu"                 # out of memory, CUDA, ZeroGPU quota
+QUEUE_FULL = "queue_full"   # Space queue saturated / rate limited
+TIMEOUT = "timeout"         # render or transport took too long
+TRANSIENT = "transient"     # connection resets, 5xx, Space restarting
+FATAL = "fatal"             # bad input or anything we cannot fix by retrying
+
+# A cheaper render helps with these; the others just need to wait
+STEP_DOWN = (GPU, TIMEOUT)
+# Only these count against a replica's circuit breaker: a GPU error is one
+# request being too big (the ladder handles it) and FATAL is usually our input
+BACKEND_FAILURES = (QUEUE_FULL, TIMEOUT, TRANSIENT)
+
+_TIMEOUT_TYPES = {"TimeoutError", "ReadTimeout", "ConnectTimeout", "WriteTimeout",
+                  "PoolTimeout", "TimeoutException"}
+_TRANSIENT_TYPES = {"ConnectionError", "ConnectionResetError", "ConnectError",
+                    "ReadError", "WriteError", "RemoteProtocolError", "NetworkError",
+                    "TransportError", "SSLError"}
+
+_GPU_MARKERS = ("gpu", "cuda", "out of memory", "memory", "quota")
+_QUEUE_MARKERS = ("queue is full", "queue full", "too many requests", "429",
+                  "rate limit")
+_TIMEOUT_MARKERS = ("timeout", "timed out", "deadline")
+_TRANSIENT_MARKERS = ("502", "503", "504", "bad gateway", "service unavailable",
+                      "connection", "temporarily", "restarting", "sleeping",
+                      "try again")
+
+
+def classify_error(exc):
+    """Map an exception from the music backend to an error class"""
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if "CircuitOpen" in names:
+        return FATAL  # the breaker already decided; retrying would defeat it
+    message = str(exc).lower()
+    if any(marker in message for marker in _GPU_MARKERS):
+        return GPU
+    if any(marker in message for marker in _QUEUE_MARKERS):
+        return QUEUE_FULL
+    if names & _TIMEOUT_TYPES or any(marker in message for marker in _TIMEOUT_MARKERS):
+        return TIMEOUT
+    if names & _TRANSIENT_TYPES or any(marker in message for marker in _TRANSIENT_MARKERS):
+        return TRANSIENT
+    return FATAL
+
+
+def is_backend_failure(exc):
+    """True when `exc` says the backend is unhealthy (CircuitBreaker.is_failure)"""
+    return classify_error(exc) in BACKEND_FAILURES
+
+
+class DeadlineExceeded(TimeoutError):
+    """No retry can finish before the overall latency deadline"""
+
+
+def fallback_ladder(steps, cfg, rungs):
+    """The user's settings first, then every cheaper rung of `rungs`"""
+    ladder = [(steps, cfg)]
+    for rung_steps, rung_cfg in rungs:
+        if rung_steps < ladder[-1][0]:
+            ladder.append((rung_steps, min(rung_cfg, cfg)))
+    return ladder
+
+
+class RetryPolicy:
+    """Attempt budget, jittered exponential backoff and an overall deadline"""
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=20.0,
+                 deadline=300.0, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.rng = rng or random.Random()
+
+    def backoff(self, attempt, category):
+        """Full-jitter delay before retry number `attempt` (1-based)"""
+        base = self.base_delay * (4 if category == QUEUE_FULL else 1)
+        return self.rng.uniform(0, min(self.max_delay, base * 2 ** (attempt - 1)))
+
+
+def run_with_fallback(attempt, ladder, policy, on_retry=None, sleep=time.sleep):
+    """Call attempt(steps, cfg, deadline) down the ladder until one succeeds
+
+    GPU and timeout errors move one rung down the ladder, queue-full and
+    transient errors retry the same rung after a backoff, fatal errors and
+    cancellations propagate at once. `deadline` is a time.monotonic() instant
+    that attempts should respect; no retry starts if its backoff alone would
+    overrun it. `on_retry(exc, category, attempt_no, steps, cfg, delay)` is
+    called before each retry. `sleep` waits out the backoff; a truthy return
+    (threading.Event.wait on a cancel event) raises JobCancelled instead of
+    starting the next attempt.
+    """
+    deadline = time.monotonic() + policy.deadline
+    rung = 0
+    for number in range(1, policy.max_attempts + 1):
+        steps, cfg = ladder[rung]
+        try:
+            return attempt(steps, cfg, deadline)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            category = classify_error(e)
+            if category == FATAL or number == policy.max_attempts:
+                raise
+            if category in STEP_DOWN and rung + 1 < len(ladder):
+                rung += 1
+                FALLBACKS.inc()
+            RETRIES.inc(category=category)
+            delay = policy.backoff(number, category)
+            if time.monotonic() + delay >= deadline:
+                raise DeadlineExceeded(
+                    f"deadline of {policy.deadline:.0f}s reached after {number} attempts"
+                ) from e
+            if on_retry is not None:
+                on_retry(e, category, number + 1, *ladder[rung], delay)
+            if sleep(delay):
+                raise JobCancelled()
@@ -0,0 +1,188 @@
+"""Routing music requests across several DiffRhythm2-compatible replicas"""
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from senorix.breaker import OPEN, CircuitBreaker, CircuitOpen
+from senorix.clients import ClientPool, gradio_client, gradio_space_is_healthy
+from senorix.config import UPSTREAM_DEPTH_TTL
+from senorix.retry import is_backend_failure
+
+
+class Replica:
+    """One endpoint with its client pool, breaker and observed performance"""
+
+    def __init__(self, src, pool, breaker, queue_ttl=60.0):
+        self.src = src
+        self.pool = pool
+        self.breaker = breaker
+        self.draining = False
+        self.inflight = 0
+        self.latency = None   # EWMA of seconds per request (queue wait included)
+        self.error_rate = 0.0  # EWMA of failures
+        self.queue_size = 0   # last upstream queue depth seen
+        self.queue_seen_at = None
+        self.queue_ttl = queue_ttl
+        self.requests = 0
+
+    @property
+    def available(self):
+        return not self.draining and self.breaker.state != OPEN
+
+    def observed_queue(self):
+        """Last upstream queue depth seen, or 0 once older than `queue_ttl`
+
+        Depths are only reported when one of our requests ends, so an old
+        reading must not hold jobs back (or push traffic away) forever: once
+        it expires, the next request measures the queue again.
+        """
+        if self.queue_seen_at is None or time.monotonic() - self.queue_seen_at > self.queue_ttl:
+            return 0
+        return self.queue_size or 0
+
+    def expected_wait(self, default_latency):
+        """Seconds a new request should take here, penalised by recent errors"""
+        latency = self.latency if self.latency is not None else default_latency
+        backlog = 1 + self.inflight + self.observed_queue()
+        return latency * backlog * (1 + 4 * self.error_rate)
+
+    def stats(self):
+        return {
+            "src": self.src,
+            "state": "draining" if self.draining else self.breaker.state,
+            "inflight": self.inflight,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "queue_size": self.observed_queue(),
+            "requests": self.requests,
+        }
+
+
+class Lease:
+    """A client borrowed from the replica picked by the router"""
+
+    def __init__(self, replica, client):
+        self.replica = replica
+        self.client = client
+
+    def report_queue(self, queue_size):
+        """Feed back the upstream queue depth seen while the request ran"""
+        if queue_size is not None:
+            self.replica.queue_size = queue_size
+            self.replica.queue_seen_at = time.monotonic()
+
+
+class ReplicaRouter:
+    """Least-expected-wait selection over replicas, skipping unhealthy ones
+
+    A replica whose breaker opens (or that is drained by hand) stops
+    receiving new requests while its in-flight ones finish normally.
+    """
+
+    def __init__(self, replicas, default_latency=60.0, alpha=0.2, rng=None):
+        if not replicas:
+            raise ValueError("ReplicaRouter needs at least one replica")
+        self.replicas = list(replicas)
+        self.default_latency = default_latency
+        self.alpha = alpha
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_sources(cls, sources, pool_size=4, probe=True, queue_ttl=UPSTREAM_DEPTH_TTL,
+                     **breaker_kwargs):
+        """Build gradio replicas for Space ids or URLs (local servers included)"""
+        replicas = []
+        for src in sources:
+            pool = ClientPool(
+                lambda src=src: gradio_client(src),
+                max_size=pool_size,
+                health_check=gradio_space_is_healthy,
+                acquire_timeout=600.0,
+                name=src,
+            )
+            breaker = CircuitBreaker(
+                src,
+                probe=(lambda src=src: gradio_space_is_healthy(gradio_client(src))) if probe else None,
+                is_failure=is_backend_failure,
+                **breaker_kwargs
+            )
+            breaker.start_probe()
+            replicas.append(Replica(src, pool, breaker, queue_ttl=queue_ttl))
+        return cls(replicas)
+
+    def _default_latency(self):
+        known = [r.latency for r in self.replicas if r.latency is not None]
+        # Unknown replicas look as good as the best known one, so they get tried
+        return min(known) if known else self.default_latency
+
+    def pick(self, exclude=()):
+        """Replica with the lowest expected wait, or CircuitOpen if none is usable"""
+        with self._lock:
+            candidates = [r for r in self.replicas if r.available and r.src not in exclude]
+            if not candidates:
+                raise CircuitOpen("Aucune réplique DiffRhythm2 disponible")
+            default = self._default_latency()
+            best = min(r.expected_wait(default) for r in candidates)
+            ties = [r for r in candidates if r.expected_wait(default) <= best * 1.05]
+            return self.rng.choice(ties)
+
+    def _record(self, replica, seconds, failed):
+        with self._lock:
+            replica.requests += 1
+            replica.error_rate += self.alpha * ((1.0 if failed else 0.0) - replica.error_rate)
+            if not failed:
+                if replica.latency is None:
+                    replica.latency = seconds
+                else:
+                    replica.latency += self.alpha * (seconds - replica.latency)
+
+    @contextmanager
+    def lease(self, exclude=()):
+        """Borrow a client from the best replica for the `with` block"""
+        tried = set(exclude)
+        with ExitStack() as stack:
+            while True:
+                replica = self.pick(tried)
+                try:
+                    stack.enter_context(replica.breaker.guard())
+                    break
+                except CircuitOpen:
+                    tried.add(replica.src)  # half-open with its trial already running
+
+            client = stack.enter_context(replica.pool.borrow())
+            with self._lock:
+                replica.inflight += 1
+            started = time.monotonic()
+            outcome = None
+            try:
+                yield Lease(replica, client)
+                outcome = "ok"
+            except Exception:
+                outcome = "failed"
+                raise
+            finally:
+                with self._lock:
+                    replica.inflight -= 1
+                # Cancelled requests say nothing about the replica
+                if outcome is not None:
+                    self._record(replica, time.monotonic() - started, outcome == "failed")
+
+    def queue_depth(self):
+        """Upstream queue depth of the least loaded usable replica (0 if unknown or stale)"""
+        with self._lock:
+            depths = [r.observed_queue() for r in self.replicas if r.available]
+        return min(depths) if depths else 0
+
+    def drain(self, src, draining=True):
+        """Stop (or resume) sending new requests to a replica"""
+        for replica in self.replicas:
+            if replica.src == src:
+                replica.draining = draining
+                return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            return [replica.stats() for replica in self.replicas]
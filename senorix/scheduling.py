@@ -0,0 +1,354 @@
+"""Job queues, per-user rate limits and admission control for JobManager
+
+A JobManager pulls its next job from a queue object:
+
+- FifoQueue: first come, first served (the default)
+- FairQueue: one lane per user, lanes take turns, so one user's burst of
+  clicks cannot push everyone else's songs back
+- PriorityQueue: shortest expected job first, with aging and priority tiers,
+  which lowers the mean wait when render costs differ a lot
+
+An Admission decides at submit time whether a job may enter the queue at all
+(per-user token bucket, queue caps, upstream depth) and at dispatch time
+whether queued jobs may start yet, holding them while the Space's own queue
+is already deep.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+
+from senorix.metrics import REGISTRY
+
+REJECTED = REGISTRY.counter(
+    "senorix_jobs_rejected_total", "Jobs refused at submit time", ("reason",)
+)
+
+
+def user_of(job):
+    """Scheduling key of a job: the `user` it was submitted with"""
+    return job.params.get("user")
+
+
+def expected_cost(job):
+    """Predicted seconds of work for a job: its `cost` param, else its `eta`"""
+    cost = job.params.get("cost", job.params.get("eta"))
+    return float(cost) if cost is not None else 0.0
+
+
+def tier_of(job):
+    return job.params.get("tier", "free")
+
+
+class Rejected(Exception):
+    """The job was not admitted; `retry_after` is a hint in seconds, or None"""
+
+    def __init__(self, message, reason, retry_after=None):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RateLimited(Rejected):
+    """The user has no generation left in their token bucket"""
+
+
+# ======================================================
+# QUEUES
+# ======================================================
+class FifoQueue:
+    """Jobs in submission order"""
+
+    def __init__(self):
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, job, task):
+        with self._cond:
+            self._items.append((job, task))
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next (job, task), or None after `timeout` seconds"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def remove(self, job):
+        """Drop a queued job; False if it already left the queue"""
+        with self._cond:
+            for item in self._items:
+                if item[0] is job:
+                    self._items.remove(item)
+                    return True
+        return False
+
+    def position(self, job):
+        """1-based dispatch position of a queued job, or None"""
+        with self._cond:
+            for index, (queued, _) in enumerate(self._items):
+                if queued is job:
+                    return index + 1
+        return None
+
+    def depth(self, user):
+        with self._cond:
+            return sum(1 for job, _ in self._items if user_of(job) == user)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class FairQueue:
+    """Round-robin across users; each user's own jobs keep their order
+
+    A user whose job was just dispatched goes to the back of the rotation,
+    and a newly arriving user joins it at the back.
+    """
+
+    def __init__(self, key=user_of):
+        self.key = key
+        self._lanes = OrderedDict()  # user -> deque of (job, task)
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def put(self, job, task):
+        with self._cond:
+            self._lanes.setdefault(self.key(job), deque()).append((job, task))
+            self._size += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next (job, task), or None after `timeout` seconds"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size, timeout):
+                return None
+            user, lane = next(iter(self._lanes.items()))
+            item = lane.popleft()
+            self._size -= 1
+            if lane:
+                self._lanes.move_to_end(user)
+            else:
+                del self._lanes[user]
+            return item
+
+    def remove(self, job):
+        """Drop a queued job; False if it already left the queue"""
+        with self._cond:
+            user = self.key(job)
+            lane = self._lanes.get(user, ())
+            for item in lane:
+                if item[0] is job:
+                    lane.remove(item)
+                    self._size -= 1
+                    if not lane:
+                        del self._lanes[user]
+                    return True
+        return False
+
+    def position(self, job):
+        """1-based dispatch position of a queued job if nobody else arrives, or None"""
+        with self._cond:
+            user = self.key(job)
+            lane = self._lanes.get(user)
+            if lane is None:
+                return None
+            index = next((i for i, item in enumerate(lane) if item[0] is job), None)
+            if index is None:
+                return None
+            ahead = index
+            before = True  # lanes ahead of this user's in the rotation
+            for other, other_lane in self._lanes.items():
+                if other == user:
+                    before = False
+                    continue
+                ahead += min(len(other_lane), index + 1 if before else index)
+            return ahead + 1
+
+    def depth(self, user):
+        with self._cond:
+            return len(self._lanes.get(user, ()))
+
+    def __len__(self):
+        with self._cond:
+            return self._size
+
+
+class PriorityQueue:
+    """Shortest expected job first, with aging and priority tiers
+
+    A job's rank is cost / tier weight minus `aging` times the seconds it
+    has waited: with aging=1.0 a job that has waited a minute counts as one
+    minute shorter, so long jobs cannot starve. Aging is the same for every
+    job, so the order between queued jobs never changes while they wait and
+    the queue is a plain heap on cost / weight + aging * enqueue time.
+    Unknown tiers get weight 1.
+    """
+
+    def __init__(self, cost=expected_cost, tiers=None, aging=1.0, tier=tier_of,
+                 clock=time.monotonic):
+        self.cost = cost
+        self.tiers = dict(tiers or {})
+        self.aging = aging
+        self.tier = tier
+        self.clock = clock
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def rank(self, job):
+        weight = self.tiers.get(self.tier(job), 1.0)
+        return self.cost(job) / weight + self.aging * self.clock()
+
+    def put(self, job, task):
+        rank = self.rank(job)
+        with self._cond:
+            heapq.heappush(self._heap, (rank, next(self._sequence), job, task))
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next (job, task), or None after `timeout` seconds"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._heap, timeout):
+                return None
+            _, _, job, task = heapq.heappop(self._heap)
+            return job, task
+
+    def remove(self, job):
+        """Drop a queued job; False if it already left the queue"""
+        with self._cond:
+            for index, entry in enumerate(self._heap):
+                if entry[2] is job:
+                    self._heap[index] = self._heap[-1]
+                    self._heap.pop()
+                    heapq.heapify(self._heap)
+                    return True
+        return False
+
+    def position(self, job):
+        """1-based dispatch position if nothing shorter arrives, or None"""
+        with self._cond:
+            entry = next((e for e in self._heap if e[2] is job), None)
+            if entry is None:
+                return None
+            return 1 + sum(1 for other in self._heap if other[:2] < entry[:2])
+
+    def depth(self, user):
+        with self._cond:
+            return sum(1 for entry in self._heap if user_of(entry[2]) == user)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+
+# ======================================================
+# RATE LIMITS AND ADMISSION
+# ======================================================
+class TokenBucket:
+    """`rate` tokens per second up to `capacity`; starts full"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, count=1):
+        """Take `count` tokens; return 0, or the seconds to wait (nothing taken)"""
+        self._refill()
+        if self.tokens >= count:
+            self.tokens -= count
+            return 0.0
+        return (count - self.tokens) / self.rate if self.rate else float("inf")
+
+    @property
+    def full(self):
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """One token bucket per key (user or session)"""
+
+    def __init__(self, per_minute, burst, max_keys=10000, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Spend one token of `key`, or raise RateLimited"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    # Full buckets carry no state worth keeping
+                    for stale in [k for k, b in self._buckets.items() if b.full]:
+                        del self._buckets[stale]
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, self.clock)
+            wait = bucket.take()
+        if wait:
+            raise RateLimited(
+                f"Limite atteinte: réessayez dans {wait:.0f}s", "rate_limited", retry_after=wait
+            )
+
+
+class Admission:
+    """Admission control for a JobManager's queue
+
+    At submit time a job is rejected when the queue (overall or for its user)
+    is full, when the upstream queue is deeper than `reject_depth`, or when
+    its user is out of tokens. Admitted jobs wait in our queue, and stay
+    there while the upstream queue is at least `defer_depth` deep, instead of
+    piling onto the Space where nobody can reorder or cancel them cheaply.
+    `upstream_depth` is a callable returning the current upstream depth.
+    """
+
+    def __init__(self, limiter=None, max_queued=None, max_queued_per_user=None,
+                 upstream_depth=None, defer_depth=None, reject_depth=None):
+        self.limiter = limiter
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.upstream_depth = upstream_depth
+        self.defer_depth = defer_depth
+        self.reject_depth = reject_depth
+
+    def _depth(self):
+        return (self.upstream_depth() or 0) if self.upstream_depth is not None else 0
+
+    def admit(self, job, queue):
+        """Raise Rejected unless `job` may enter `queue`"""
+        try:
+            if self.max_queued is not None and len(queue) >= self.max_queued:
+                raise Rejected("File d'attente pleine, réessayez plus tard", "queue_full")
+            user = user_of(job)
+            if self.max_queued_per_user is not None and queue.depth(user) >= self.max_queued_per_user:
+                raise Rejected(
+                    f"Déjà {self.max_queued_per_user} générations en attente pour vous",
+                    "user_queue_full",
+                )
+            if self.reject_depth is not None and self._depth() >= self.reject_depth:
+                raise Rejected("DiffRhythm2 est saturé, réessayez dans quelques minutes",
+                               "upstream_full", retry_after=60.0)
+            # Last, so refused jobs do not cost the user a token
+            if self.limiter is not None:
+                self.limiter.take(user)
+        except Rejected as e:
+            REJECTED.inc(reason=e.reason)
+            raise
+
+    def may_dispatch(self):
+        """False while queued jobs should be held back"""
+        return self.defer_depth is None or self._depth() < self.defer_depth
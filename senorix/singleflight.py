@@ -0,0 +1,79 @@
+"""Coalesce concurrent identical calls into a single execution"""
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Run `fn` once per key at a time; concurrent callers share the outcome
+
+    The first caller for a key (the leader) executes the call, everyone who
+    arrives while it is running waits for and receives the same result or
+    exception. Nothing is remembered once the call completes.
+
+    do() covers the simple blocking case; join()/complete() let a caller that
+    must stay responsive (cancellation, progress) wait on the shared Future
+    itself.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def join(self, key, owner=None):
+        """Return (future, is_leader); a leader must later call complete()
+
+        `owner` is stored on a new future as `future.owner` so followers can
+        look at whoever is doing the work (e.g. its progress).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self._calls[key] = Future()
+            call.owner = owner
+            return call, True
+
+    def follow(self, key):
+        """Return the in-flight future for `key` without ever leading, or None"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+            return call
+
+    def running(self, key):
+        """Whether a call for `key` is in flight"""
+        with self._lock:
+            return key in self._calls
+
+    def complete(self, key, result=None, error=None):
+        """Publish the leader's outcome and forget the key"""
+        with self._lock:
+            call = self._calls.pop(key, None)
+        if call is None:
+            return
+        if error is not None:
+            call.set_exception(error)
+        else:
+            call.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), sharing an identical in-flight call"""
+        call, leader = self.join(key)
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.complete(key, error=e)
+            raise
+        self.complete(key, result)
+        return result
+
+    def in_flight(self):
+        """Number of keys currently executing"""
+        with self._lock:
+            return len(self._calls)
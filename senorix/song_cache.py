@@ -0,0 +1,106 @@
+"""Content-addressed on-disk cache for generated songs"""
+import os
+import shutil
+import tempfile
+import threading
+
+from senorix.config import FILE_TYPE
+
+
+class SongCache:
+    """Byte-budgeted song cache keyed on everything that determines the audio
+
+    Entries are plain files named `<key>.<file type>`, keys being
+    senorix.music.request_key digests, so a lookup is a single stat. Reading
+    an entry bumps its mtime, so eviction drops the least recently used files
+    first once the directory grows past `max_bytes`. The size is scanned once
+    at start and then tracked on put and evict.
+    """
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3, file_type=FILE_TYPE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.file_type = file_type
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                yield entry
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    def get(self, key):
+        """Return the cached file path for `key`, or None"""
+        path = self._path(key, "." + self.file_type)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key, src_path):
+        """Copy `src_path` into the cache and return the cached path"""
+        dest = self._path(key, os.path.splitext(src_path)[1])
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        os.close(fd)
+        try:
+            shutil.copyfile(src_path, tmp)
+            size = os.path.getsize(tmp)
+            with self._lock:
+                try:
+                    replaced = os.path.getsize(dest)
+                except OSError:
+                    replaced = 0
+                os.replace(tmp, dest)
+                self._bytes += size - replaced
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        if self._bytes > self.max_bytes:
+            self.evict()
+        return dest
+
+    def evict(self):
+        """Drop least recently used entries until the budget is respected"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in self._entries():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+            self._bytes = total
+            return total
+
+    def stats(self):
+        """Hit/miss counters and disk usage, from memory"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
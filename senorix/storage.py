@@ -0,0 +1,154 @@
+"""Disk quota and garbage collection for downloaded audio
+
+Every render leaves its file in gradio_client's download directory and
+nothing else ever removes it. AudioStore keeps that directory under a byte
+quota and an age limit, sweeping on a background thread:
+
+- files referenced by a live session (`pinned`) are never removed
+- files referenced only by the history (`kept`) are removed last, once
+  unreferenced files are not enough to get under the quota; the history
+  then shows them as expired
+- files younger than `min_age` are skipped (a download may still be writing)
+
+Eviction is least recently used first: playing a file through `touch` bumps
+its mtime.
+"""
+import os
+import threading
+import time
+
+from senorix.metrics import REGISTRY, logger
+
+RECLAIMED_BYTES = REGISTRY.counter(
+    "senorix_audio_reclaimed_bytes_total", "Audio bytes deleted by the sweeper", ("reason",)
+)
+RECLAIMED_FILES = REGISTRY.counter(
+    "senorix_audio_reclaimed_files_total", "Audio files deleted by the sweeper", ("reason",)
+)
+
+
+def _real(paths):
+    return {os.path.realpath(path) for path in paths if path}
+
+
+class AudioStore:
+    """Byte quota and age limit for the audio files under `directory`
+
+    `pinned` and `kept` are callables returning the paths currently
+    referenced by live sessions and by the history.
+    """
+
+    def __init__(self, directory, max_bytes, max_age=None, min_age=60.0,
+                 pinned=None, kept=None, clock=time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_age = min_age
+        self.pinned = pinned
+        self.kept = kept
+        self.clock = clock
+        self.sweeps = 0
+        self.last_sweep = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _files(self):
+        """[(mtime, size, real path)] of every regular file under the directory"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, os.path.realpath(path)))
+        return files
+
+    def _remove(self, path, size, reason):
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        RECLAIMED_BYTES.inc(size, reason=reason)
+        RECLAIMED_FILES.inc(reason=reason)
+        # gradio_client downloads into one directory per file
+        parent = os.path.dirname(path)
+        if parent != os.path.realpath(self.directory):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                pass
+        return True
+
+    def touch(self, path):
+        """Mark `path` as just used, so it is evicted last"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def usage(self):
+        return sum(size for _, size, _ in self._files())
+
+    def sweep(self):
+        """Apply the age limit, then the quota; return {"files": n, "bytes": n} reclaimed"""
+        with self._lock:
+            now = self.clock()
+            pinned = _real(self.pinned()) if self.pinned else set()
+            kept = _real(self.kept()) if self.kept else set()
+            files = sorted(self._files())
+            total = sum(size for _, size, _ in files)
+            reclaimed = {"files": 0, "bytes": 0}
+
+            def remove(entry, reason):
+                nonlocal total
+                _, size, path = entry
+                if self._remove(path, size, reason):
+                    total -= size
+                    reclaimed["files"] += 1
+                    reclaimed["bytes"] += size
+                    return True
+                return False
+
+            candidates = [entry for entry in files
+                          if entry[2] not in pinned and now - entry[0] >= self.min_age]
+            unreferenced = [entry for entry in candidates if entry[2] not in kept]
+            remaining = []
+            for entry in unreferenced:
+                if self.max_age is not None and now - entry[0] > self.max_age:
+                    remove(entry, "age")
+                else:
+                    remaining.append(entry)
+
+            # Oldest first, history-referenced files only after all the others
+            for entry in remaining + [entry for entry in candidates if entry[2] in kept]:
+                if total <= self.max_bytes:
+                    break
+                remove(entry, "quota")
+
+            self.sweeps += 1
+            self.last_sweep = now
+        if reclaimed["files"]:
+            logger.info("audio sweep", extra={"fields": {
+                "event": "audio_sweep", "bytes_used": total, **reclaimed
+            }})
+        return reclaimed
+
+    def start(self, interval=300.0):
+        """Sweep every `interval` seconds on a daemon thread"""
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:  # keep sweeping; a bad pass must not stop GC
+                    logger.warning("audio sweep failed: %s", e)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=loop, name="senorix-audio-gc", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -1,9 +1,38 @@
 import streamlit as st
-import cohere
-import re
+import logging
+import os
+import tempfile
 import time
-import traceback
-from gradio_client import Client
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import RerunException, StopException
+from senorix.breaker import CLOSED, HALF_OPEN, STATE_CODES
+from senorix.clients import ClientPool, cohere_client
+from senorix.config import (
+    AUDIO_DIR, AUDIO_MAX_AGE, AUDIO_QUOTA_BYTES, AUDIO_SWEEP_INTERVAL, DRAFT_CFG,
+    DRAFT_STEPS, FILE_TYPE, HEDGE_BUDGET, HEDGE_PERCENTILE, HEDGING_ENABLED, JOB_QUEUE,
+    LYRICS_PREAMBLE, LYRICS_TEMPERATURE, MAX_LINES, MAX_QUEUED_JOBS,
+    MAX_QUEUED_PER_USER, MAX_WORDS, MODEL_NAME, MUSIC_SPACES, PRIORITY_AGING,
+    PRIORITY_TIERS, SAFE_CFG, SAFE_STEPS, UPSTREAM_DEFER_DEPTH, UPSTREAM_REJECT_DEPTH,
+    USER_BURST, USER_GENERATIONS_PER_MINUTE
+)
+from senorix.eta import EtaModel, lrc_line_count
+from senorix.generation import request_candidates, request_lyrics, stream_lyrics
+from senorix.hedge import Hedger
+from senorix.history import History, job_timings
+from senorix.jobs import CANCELLED, PENDING, SUCCEEDED, JobManager
+from senorix.lyrics import analyze_lyrics, build_text_prompt, rank_lyrics
+from senorix.media import MediaServer
+from senorix.metrics import CACHE_REQUESTS, REGISTRY, MetricsServer, configure_logging, span
+from senorix.music import generate_music, generate_progressive, request_key
+from senorix.router import ReplicaRouter
+from senorix.scheduling import (
+    Admission, FairQueue, FifoQueue, PriorityQueue, RateLimiter, Rejected
+)
+from senorix.singleflight import SingleFlight
+from senorix.song_cache import SongCache
+from senorix.storage import AudioStore
+from senorix.ttl_cache import TTLCache
 
 # ======================================================
 # PAGE CONFIG
@@ -19,443 +48,881 @@ st.caption("Lyrics → Format sécurisé → Génération musicale stable (DiffR
 # ======================================================
 # COHERE
 # ======================================================
-co = cohere.Client(st.secrets["COHERE_API_KEY"])
-MODEL_NAME = "command-a-vision-07-2025"
+COHERE_POOL_SIZE = 8
+
+@st.cache_resource
+def get_cohere_pool():
+    """Process-wide Cohere clients, shared by every session and rerun"""
+    api_key = st.secrets["COHERE_API_KEY"]
+    return ClientPool(
+        lambda: cohere_client(api_key),
+        max_size=COHERE_POOL_SIZE,
+        name="Cohere"
+    )
+
+cohere_pool = get_cohere_pool()
 
 # ======================================================
 # DIFFRHYTHM2
 # ======================================================
-MUSIC_SPACE = "ASLP-lab/DiffRhythm2"
-MUSIC_API = "/infer_music"
+MUSIC_POOL_SIZE = 8
+# As many running jobs as upstream clients: the rest wait in our fair queue,
+# not in arrival order on a client pool or the Space's queue
+MUSIC_JOB_WORKERS = MUSIC_POOL_SIZE * len(MUSIC_SPACES)
+JOB_POLL_INTERVAL = 1.0
+ETA_MODEL_PATH = os.environ.get(
+    "SENORIX_ETA_MODEL",
+    os.path.join(tempfile.gettempdir(), "senorix_eta.json")
+)
+
+@st.cache_resource
+def get_music_router():
+    """Process-wide DiffRhythm2 replicas, each with its client pool and breaker
 
-try:
-    music_client = Client(MUSIC_SPACE)
+    Replicas come from SENORIX_MUSIC_SPACES; handshakes happen once, not per rerun.
+    """
+    router = ReplicaRouter.from_sources(MUSIC_SPACES, pool_size=MUSIC_POOL_SIZE)
+    for replica in router.replicas:
+        replica.pool.warm_async()
+    return router
+
+@st.cache_resource
+def get_hedger():
+    """Tail-latency hedging across replicas (SENORIX_HEDGING=1 with 2+ replicas)"""
+    if not HEDGING_ENABLED or len(MUSIC_SPACES) < 2:
+        return None
+    return Hedger(percentile=HEDGE_PERCENTILE, budget=HEDGE_BUDGET)
+
+@st.cache_resource
+def get_music_flight():
+    """Lets identical in-flight generations from different sessions share one render"""
+    return SingleFlight()
+
+@st.cache_resource
+def get_job_manager():
+    """Background music jobs, shared by all sessions and kept across reruns
+
+    Queue order follows JOB_QUEUE (shortest expected job first by default);
+    each session has a token bucket, and jobs are held or refused while the
+    DiffRhythm2 queues are already deep.
+    """
+    router = get_music_router()
+    if JOB_QUEUE == "fair":
+        queue = FairQueue()
+    elif JOB_QUEUE == "fifo":
+        queue = FifoQueue()
+    else:
+        queue = PriorityQueue(tiers=PRIORITY_TIERS, aging=PRIORITY_AGING)
+    return JobManager(
+        max_workers=MUSIC_JOB_WORKERS,
+        queue=queue,
+        admission=Admission(
+            limiter=RateLimiter(USER_GENERATIONS_PER_MINUTE, USER_BURST),
+            max_queued=MAX_QUEUED_JOBS,
+            max_queued_per_user=MAX_QUEUED_PER_USER,
+            upstream_depth=router.queue_depth,
+            defer_depth=UPSTREAM_DEFER_DEPTH,
+            reject_depth=UPSTREAM_REJECT_DEPTH,
+        )
+    )
+
+@st.cache_resource
+def get_eta_model():
+    """Render-time predictor fitted on this deployment's past generations"""
+    return EtaModel(ETA_MODEL_PATH)
+
+music_router = get_music_router()
+hedger = get_hedger()
+music_flight = get_music_flight()
+job_manager = get_job_manager()
+eta_model = get_eta_model()
+
+BREAKER_LABELS = {
+    CLOSED: "🟢 Disponible",
+    HALF_OPEN: "🟡 Reprise en test",
+    "draining": "⚪ En retrait",
+}
+st.sidebar.markdown("### 🩺 État DiffRhythm2")
+replica_stats = music_router.stats()
+for replica, stats in zip(music_router.replicas, replica_stats):
+    latency = f"{stats['latency']:.0f}s" if stats["latency"] is not None else "—"
+    st.sidebar.metric(stats["src"], BREAKER_LABELS.get(stats["state"], "🔴 Indisponible"))
+    breaker_stats = replica.breaker.stats()
+    st.sidebar.caption(
+        f"Latence: {latency} · En cours: {stats['inflight']} · File: {stats['queue_size']} · "
+        f"Échecs consécutifs: {breaker_stats['consecutive_failures']} · "
+        f"Coupures: {breaker_stats['trips']} · Rejets rapides: {breaker_stats['rejected']}"
+    )
+
+st.sidebar.caption(
+    f"Générations partagées: {music_flight.coalesced} · en cours: {music_flight.in_flight()}"
+)
+
+if hedger is not None:
+    hedge_stats = hedger.stats()
+    st.sidebar.caption(
+        f"Hedging: {hedge_stats['hedges']} relances / {hedge_stats['requests']} requêtes · "
+        f"gagnées: {hedge_stats['hedge_wins']}"
+    )
+
+available = [replica for replica in music_router.replicas if replica.available]
+if not available:
+    errors = "; ".join(str(r.breaker.last_error) for r in music_router.replicas if r.breaker.last_error)
+    st.warning(f"DiffRhythm2 semble indisponible: {errors or 'toutes les répliques sont en retrait'}")
+elif any(r.pool.stats()["idle"] or r.pool.stats()["in_use"] for r in available):
     st.success("Connecté à DiffRhythm2")
-except Exception as e:
-    st.error(f"Impossible de connecter DiffRhythm2: {e}")
-    music_client = None
+elif all(r.pool.last_error for r in available):
+    st.error(f"Impossible de connecter DiffRhythm2: {available[0].pool.last_error}")
+else:
+    st.info("Connexion à DiffRhythm2 en cours...")
 
 # ======================================================
 # CONSTANTES
 # ======================================================
-MAX_WORDS = 220
-MAX_LINES = 20
-SAFE_STEPS = 16
-SAFE_CFG = 1.3
-FILE_TYPE = "mp3"
+SONG_CACHE_DIR = os.environ.get(
+    "SENORIX_SONG_CACHE",
+    os.path.join(tempfile.gettempdir(), "senorix_songs")
+)
+SONG_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+@st.cache_resource
+def get_song_cache():
+    """Process-wide cache of rendered songs"""
+    return SongCache(SONG_CACHE_DIR, max_bytes=SONG_CACHE_MAX_BYTES)
+
+song_cache = get_song_cache()
+
+HISTORY_PATH = os.environ.get(
+    "SENORIX_HISTORY_DB",
+    os.path.join(tempfile.gettempdir(), "senorix_history.sqlite3")
+)
+HISTORY_PAGE_SIZE = 5
+
+@st.cache_resource
+def get_history():
+    """Past generations of every user, kept across reloads and restarts"""
+    return History(HISTORY_PATH)
+
+history = get_history()
+
+@st.cache_resource
+def get_audio_store():
+    """Keeps gradio's download directory under its quota, sweeping in the background
+
+    Results and drafts of jobs still held by the JobManager are never
+    removed; files in the history go last.
+    """
+    def live_audio():
+        return [
+            path for job in job_manager.jobs()
+            for path in (job.result, job.partial) if isinstance(path, str)
+        ]
+
+    store = AudioStore(
+        AUDIO_DIR, AUDIO_QUOTA_BYTES,
+        max_age=AUDIO_MAX_AGE,
+        pinned=live_audio,
+        kept=history.audio_paths
+    )
+    return store.start(AUDIO_SWEEP_INTERVAL)
+
+audio_store = get_audio_store()
+
+MEDIA_HOST = os.environ.get("SENORIX_MEDIA_HOST", "0.0.0.0")
+MEDIA_PORT = int(os.environ.get("SENORIX_MEDIA_PORT", "8502"))
+# URL under which browsers reach the media server (e.g. behind a proxy).
+# Without it the audio goes through Streamlit: the app cannot guess an
+# address remote browsers can reach.
+MEDIA_URL = os.environ.get("SENORIX_MEDIA_URL")
+
+@st.cache_resource
+def get_media_server():
+    """Streams audio from disk with Range/caching support
+
+    Every file sent from its start (a playback or a download) is marked as
+    used for the audio sweeper. None when no public URL is configured or the
+    port cannot be bound.
+    """
+    if not MEDIA_URL:
+        return None
+    try:
+        return MediaServer(MEDIA_HOST, MEDIA_PORT, public_url=MEDIA_URL,
+                           on_serve=audio_store.touch).start()
+    except OSError:
+        return None
+
+media_server = get_media_server()
 
 # ======================================================
 # SESSION STATE
 # ======================================================
-for key in ["lyrics", "audio", "generated"]:
+for key in ["lyrics", "generated", "job_id", "sheet", "music_params", "polling",
+            "history_cursors", "lyric_candidates"]:
     if key not in st.session_state:
         st.session_state[key] = None
 
+# Identity of this browser (rate limit, fair share, history). Kept in the
+# URL so a reload or a bookmark finds the same history.
+if "user_id" not in st.session_state:
+    st.session_state.user_id = st.query_params.get("u") or uuid.uuid4().hex
+    st.query_params["u"] = st.session_state.user_id
+
+# Audio files this session asked to hear (see render_audio)
+if "opened_audio" not in st.session_state:
+    st.session_state.opened_audio = set()
+
+# Paying users open the app with ?key=<one of st.secrets["PREMIUM_KEYS"]>
+if "tier" not in st.session_state:
+    premium_keys = st.secrets.get("PREMIUM_KEYS", [])
+    st.session_state.tier = "paid" if st.query_params.get("key") in premium_keys else "free"
+
 # ======================================================
 # UTILS
 # ======================================================
-def clean_text(text):
-    """Remove code blocks and chords"""
-    text = text.replace("```", "")
-    text = re.sub(r'\b[A-G](#|b|m|maj|min|sus|dim)?\d*\b', '', text)
-    return text.strip()
-
-def enforce_limits(text):
-    """Enforce word and line limits"""
-    words = text.split()
-    if len(words) > MAX_WORDS:
-        text = " ".join(words[:MAX_WORDS])
-        st.warning(f"Texte tronqué à {MAX_WORDS} mots")
-
-    lines = [l for l in text.splitlines() if l.strip()]
-    if len(lines) > MAX_LINES:
-        lines = lines[:MAX_LINES]
-        st.warning(f"Texte tronqué à {MAX_LINES} lignes")
-
-    return "\n".join(lines)
-
-def safe_lrc_structure(text):
-    """Create valid LRC structure for DiffRhythm2"""
-    lines = [l for l in text.splitlines() if l.strip()]
-
-    if not lines:
-        return "[start]\n[intro]\n[verse]\nEmpty song\n[chorus]\nEmpty chorus\n[outro]"
-
-    # Split into verse and chorus
-    mid = max(1, len(lines) // 2)
-    verse_lines = lines[:mid]
-    chorus_lines = lines[mid:] if mid < len(lines) else lines[:2]
-
-    # Build LRC format
-    lrc_parts = [
-        "[start]",
-        "[intro]",
-        "",
-        "[verse]"
-    ]
-    lrc_parts.extend(verse_lines)
-    lrc_parts.extend(["", "[chorus]"])
-    lrc_parts.extend(chorus_lines)
-    lrc_parts.extend(["", "[outro]"])
-    
-    return "\n".join(lrc_parts)
-
-def prepare_lyrics(text):
-    """Full preparation pipeline"""
-    text = clean_text(text)
-    text = enforce_limits(text)
-    return safe_lrc_structure(text)
-
-def lyrics_are_valid(text):
-    """Validate lyrics"""
-    if not text or not text.strip():
-        return False
-    words = text.split()
-    if len(words) < 10:
-        return False
-    if len(words) > MAX_WORDS:
-        return False
-    return True
-
-def build_text_prompt(genre, mood, voice_type):
-    """Build text prompt with voice type"""
-    # Map voice types to descriptive terms
-    voice_map = {
-        "Baritone (Voix masculine moyenne)": "male baritone vocals",
-        "Baritenor (Voix masculine medium-haute)": "male baritenor vocals",
-        "Bass (Voix masculine grave)": "male bass vocals, deep voice",
-        "Tenor (Voix masculine haute)": "male tenor vocals, high male voice",
-        "Mezzosoprano (Voix féminine moyenne)": "female mezzo-soprano vocals",
-        "Soprano (Voix féminine haute)": "female soprano vocals, high female voice",
-        "Contralto (Voix féminine grave)": "female contralto vocals, low female voice"
-    }
-    
-    voice_desc = voice_map.get(voice_type, "vocals")
-    
-    return f"{genre}, {voice_desc}, {mood}"
+def render_audio(path, file_name):
+    """Player + download link; the browser fetches the file from the media server
+
+    Without a media server the bytes go through Streamlit on every rerun, so
+    the player is only loaded once asked for. Either way the file counts as
+    used (see AudioStore) only when it is actually played or downloaded.
+    """
+    with span("render_audio", level=logging.DEBUG):
+        if media_server is not None:
+            st.audio(media_server.url_for(path), format=f"audio/{FILE_TYPE}")
+            st.link_button(
+                f"⬇️ Télécharger {FILE_TYPE.upper()}",
+                media_server.url_for(path, download_name=file_name),
+                use_container_width=True
+            )
+            return
+
+        # No media endpoint: fall back to sending the bytes through Streamlit
+        if path not in st.session_state.opened_audio:
+            if not st.button("▶️ Écouter / télécharger", key=f"open_{file_name}_{path}",
+                             use_container_width=True):
+                return
+            st.session_state.opened_audio.add(path)
+            audio_store.touch(path)
+        st.audio(path)
+        try:
+            with open(path, "rb") as f:
+                downloaded = st.download_button(
+                    label=f"⬇️ Télécharger {FILE_TYPE.upper()}",
+                    data=f,
+                    file_name=file_name,
+                    mime=f"audio/{FILE_TYPE}",
+                    key=f"download_{file_name}_{path}",
+                    use_container_width=True
+                )
+            if downloaded:
+                audio_store.touch(path)
+        except OSError as e:
+            st.warning(f"⚠️ Download non disponible: {e}")
 
 # ======================================================
 # COHERE LYRICS GENERATION
 # ======================================================
-def generate_lyrics(prompt):
-    """Generate lyrics with Cohere"""
-    system = """You are a professional songwriter.
-Write short emotional lyrics.
-Rules:
-- NO chords
-- MAX 2 sections (verse + chorus)
-- Simple lines
-- Emotional
-- Total: max 16 lines"""
+LYRICS_CACHE_TTL = 600
+LYRICS_CACHE_SIZE = 512
+
+@st.cache_resource
+def get_lyrics_cache():
+    """Recent Cohere answers, shared by all sessions"""
+    return TTLCache(maxsize=LYRICS_CACHE_SIZE, ttl=LYRICS_CACHE_TTL)
+
+@st.cache_resource
+def get_lyrics_flight():
+    """Coalesces identical Cohere requests that are in flight at the same time"""
+    return SingleFlight()
+
+@st.cache_resource
+def get_lyrics_executor():
+    """Threads running streamed Cohere calls while sessions draw the preview"""
+    return ThreadPoolExecutor(max_workers=COHERE_POOL_SIZE, thread_name_prefix="lyrics-stream")
+
+lyrics_cache = get_lyrics_cache()
+lyrics_flight = get_lyrics_flight()
+lyrics_executor = get_lyrics_executor()
+
+# st.rerun()/st.stop() unwind the script with these; they are not errors
+SCRIPT_CONTROL = (RerunException, StopException)
+LYRICS_PREVIEW_INTERVAL = 0.1
+
+def generate_lyrics(prompt, on_partial=None):
+    """Generate lyrics with Cohere
+
+    With `on_partial`, lyrics are streamed: the callback receives the text
+    written so far and the stream stops once the line/word budget is reached.
+    Streamed or not, an identical request already in flight is shared; a
+    session that joins someone else's stream gets the result without the
+    live preview. The shared call only fills a buffer: `on_partial` runs
+    here, outside the flight and the pooled client, so a rerun or a failing
+    preview affects this session alone.
+    """
+    key = (" ".join(prompt.split()), MODEL_NAME, LYRICS_PREAMBLE, LYRICS_TEMPERATURE)
+    cached = lyrics_cache.get(key)
+    CACHE_REQUESTS.inc(cache="lyrics", result="miss" if cached is None else "hit")
+    if cached is not None:
+        return cached
+
+    def fetch():
+        with cohere_pool.borrow() as co:
+            lyrics = request_lyrics(co, prompt)
+        if lyrics:
+            lyrics_cache.set(key, lyrics)
+        return lyrics
+
+    written = {"text": ""}
+
+    def stream():
+        lyrics = ""
+        with cohere_pool.borrow() as co:
+            for lyrics in stream_lyrics(co, prompt):
+                written["text"] = lyrics
+        lyrics = lyrics.strip()
+        if lyrics:
+            lyrics_cache.set(key, lyrics)
+        return lyrics
+
+    def preview(call):
+        callback, shown = on_partial, ""
+        while not call.done():
+            text = written["text"]
+            if callback is not None and text != shown:
+                shown = text
+                try:
+                    callback(text)
+                except SCRIPT_CONTROL:
+                    raise
+                except Exception:
+                    callback = None  # no preview for this session, lyrics still come
+            time.sleep(LYRICS_PREVIEW_INTERVAL)
+        return call.result()
 
     try:
-        response = co.chat(
-            model=MODEL_NAME,
-            message=f"Write a song about: {prompt}",
-            preamble=system,
-            temperature=0.7,
-            max_tokens=300
-        )
-        return response.text.strip()
+        if on_partial is None:
+            return lyrics_flight.do(key, fetch)
+        return preview(lyrics_executor.submit(lyrics_flight.do, key, stream))
+    except SCRIPT_CONTROL:
+        raise
     except Exception as e:
         st.error(f"Erreur Cohere: {e}")
         return ""
 
+LYRICS_CANDIDATES_MAX = 5
+
+def generate_lyric_candidates(prompt, count):
+    """`count` Cohere drafts requested at once, ranked best first (see score_lyrics)
+
+    Returns [{"text", "score", "words", "lines", "valid"}]. The drafts are
+    separate calls; only a whole identical request (same prompt and count)
+    is shared with another session or served from the cache.
+    """
+    key = (" ".join(prompt.split()), MODEL_NAME, LYRICS_PREAMBLE, LYRICS_TEMPERATURE, count)
+    cached = lyrics_cache.get(key)
+    CACHE_REQUESTS.inc(cache="lyrics", result="miss" if cached is None else "hit")
+    if cached is not None:
+        return cached
+
+    def fetch():
+        texts = request_candidates(cohere_pool, prompt, count)
+        ranked = [
+            {"text": text, "score": score, "words": sheet.words,
+             "lines": sheet.lines, "valid": sheet.valid}
+            for score, text, sheet in rank_lyrics(texts)
+        ]
+        if ranked:
+            lyrics_cache.set(key, ranked)
+        return ranked
+
+    try:
+        return lyrics_flight.do(key, fetch)
+    except SCRIPT_CONTROL:
+        raise
+    except Exception as e:
+        st.error(f"Erreur Cohere: {e}")
+        return []
+
 # ======================================================
-# MUSIC GENERATION
+# METRICS
 # ======================================================
-def generate_music_safe(lyrics, mood, genre, voice_type):
-    """Generate music with detailed error handling"""
-    if not music_client:
-        st.error("Client musical non disponible")
+METRICS_HOST = os.environ.get("SENORIX_METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.environ.get("SENORIX_METRICS_PORT", "9464"))
+LOG_LEVEL = os.environ.get("SENORIX_LOG_LEVEL", "INFO")
+
+@st.cache_resource
+def get_metrics_server():
+    """/metrics for the whole process (every session) and JSON logs on stderr
+
+    Returns None if the port cannot be bound; logging is set up regardless.
+    """
+    configure_logging(LOG_LEVEL)
+    replica_labels = ("replica",)
+    REGISTRY.gauge("senorix_replica_up", "1 when the replica accepts new requests",
+                   replica_labels).set_function(
+        lambda: {(r.src,): int(r.available) for r in music_router.replicas})
+    REGISTRY.gauge("senorix_replica_inflight", "Renders running on the replica",
+                   replica_labels).set_function(
+        lambda: {(r.src,): r.inflight for r in music_router.replicas})
+    REGISTRY.gauge("senorix_replica_queue_size", "Last upstream queue depth seen",
+                   replica_labels).set_function(
+        lambda: {(r.src,): r.observed_queue() for r in music_router.replicas})
+    REGISTRY.gauge("senorix_breaker_state", "Circuit of the replica: 0 closed, 1 half-open, 2 open",
+                   replica_labels).set_function(
+        lambda: {(r.src,): STATE_CODES[r.breaker.stats()["state"]] for r in music_router.replicas})
+    REGISTRY.counter("senorix_breaker_trips_total", "Times the replica's circuit opened",
+                     replica_labels).set_function(
+        lambda: {(r.src,): r.breaker.stats()["trips"] for r in music_router.replicas})
+    REGISTRY.counter("senorix_breaker_rejected_total", "Requests refused by an open circuit",
+                     replica_labels).set_function(
+        lambda: {(r.src,): r.breaker.stats()["rejected"] for r in music_router.replicas})
+    REGISTRY.gauge("senorix_jobs_active", "Music jobs queued or running").set_function(
+        lambda: len(job_manager.active()))
+    REGISTRY.gauge("senorix_jobs_queued", "Music jobs waiting for their turn").set_function(
+        lambda: len(job_manager.queue))
+    REGISTRY.counter("senorix_coalesced_total", "Requests answered by an identical in-flight one",
+                     ("kind",)).set_function(
+        lambda: {("music",): music_flight.coalesced, ("lyrics",): lyrics_flight.coalesced})
+    REGISTRY.gauge("senorix_song_cache_bytes", "Size of the song cache on disk").set_function(
+        lambda: song_cache.stats()["bytes"])
+    REGISTRY.gauge("senorix_audio_bytes", "Size of gradio's audio download directory").set_function(
+        audio_store.usage)
+    if hedger is not None:
+        REGISTRY.counter("senorix_hedges_total", "Renders duplicated on a second replica",
+                         ("result",)).set_function(
+            lambda: {("sent",): hedger.stats()["hedges"], ("won",): hedger.stats()["hedge_wins"]})
+    if media_server is not None:
+        REGISTRY.counter("senorix_media_bytes_sent_total", "Audio bytes streamed to browsers"
+                         ).set_function(lambda: media_server.bytes_sent)
+    try:
+        return MetricsServer(METRICS_HOST, METRICS_PORT).start()
+    except OSError:
         return None
 
-    # Prepare lyrics
-    lrc = prepare_lyrics(lyrics)
-    
-    # Show generated LRC (debug)
-    with st.expander("Debug: Format LRC Généré"):
-        st.code(lrc)
-    
-    # Build prompt with voice type
-    prompt = build_text_prompt(genre, mood, voice_type)
-    
-    st.info(f"Envoi à DiffRhythm2...")
-    st.info(f"Prompt: {prompt}")
-    st.info(f"Steps: {SAFE_STEPS}, CFG: {SAFE_CFG}")
+metrics_server = get_metrics_server()
 
+# ======================================================
+# MUSIC GENERATION
+# ======================================================
+def generate_music_safe(job, lrc, prompt, steps, cfg, seed=None, use_cache=True,
+                        progressive=False):
+    """Generate music on a background job worker (see senorix.music)
+
+    The outcome goes to the history from here, so it is kept even when the
+    user closed the page before the render finished. A draft whose final
+    render was cancelled or failed is recorded too.
+    """
+    render = generate_progressive if progressive else generate_music
+    audio = None
     try:
-        # First attempt with normal parameters
-        st.info("Tentative 1: Paramètres normaux...")
-        
-        result = music_client.predict(
-            lrc=lrc,
-            audio_prompt=None,
-            text_prompt=prompt,
-            seed=0,
-            randomize_seed=True,
-            steps=SAFE_STEPS,
-            cfg_strength=SAFE_CFG,
-            file_type=FILE_TYPE,
-            odeint_method="euler",
-            api_name=MUSIC_API
+        audio = render(
+            job, music_router, lrc, prompt, steps, cfg,
+            seed=seed,
+            song_cache=song_cache if use_cache else None,
+            eta_model=eta_model,
+            hedger=hedger,
+            flight=music_flight
         )
-        
-        st.success("Génération complétée!")
-        
-        # Debug: show result
-        with st.expander("Debug: Réponse API"):
-            st.write("Type:", type(result))
-            st.write("Contenu:", result)
-        
-        # Extract audio path
-        if isinstance(result, (list, tuple)) and len(result) > 0:
-            return result[0]
-        elif isinstance(result, str):
-            return result
-        else:
-            st.error(f"Format de réponse invalide: {type(result)}")
-            return None
+        return audio
+    finally:
+        if audio or job.partial:
+            record_history(job, lrc, prompt, steps, cfg, seed, audio)
 
-    except Exception as e:
-        # Show REAL error instead of hiding it
-        error_msg = str(e)
-        st.error(f"Erreur spécifique: {error_msg}")
-        
-        # Show full stack trace
-        with st.expander("Stack Trace Complet"):
-            st.code(traceback.format_exc())
-        
-        # Fallback only if GPU error
-        if "gpu" in error_msg.lower() or "memory" in error_msg.lower():
-            st.warning("Tentative avec paramètres réduits...")
-            try:
-                result = music_client.predict(
-                    lrc=lrc,
-                    audio_prompt=None,
-                    text_prompt="ambient, simple",
-                    seed=0,
-                    randomize_seed=True,
-                    steps=10,
-                    cfg_strength=1.0,
-                    file_type="mp3",
-                    odeint_method="euler",
-                    api_name=MUSIC_API
-                )
-                
-                if isinstance(result, (list, tuple)) and len(result) > 0:
-                    return result[0]
-                elif isinstance(result, str):
-                    return result
-                    
-            except Exception as e2:
-                st.error(f"Fallback échoué: {str(e2)}")
-                return None
-        else:
-            st.error("Vérifiez le format LRC dans l'expander debug ci-dessus")
-            return None
+def record_history(job, lrc, prompt, steps, cfg, seed, audio):
+    """Store the final song, or the kept draft when there is none
+
+    The seed is the one actually rendered: a progressive job draws its own
+    when none was given (see generate_progressive).
+    """
+    params = job.params
+    seed = params.get("seed", seed)
+    if not audio:
+        steps, cfg = DRAFT_STEPS, min(DRAFT_CFG, cfg)
+    try:
+        history.record(
+            params["user"], params["lyrics"], lrc, prompt, audio or job.partial,
+            request_key=request_key(lrc, prompt, steps, cfg, seed),
+            genre=params["genre"],
+            mood=params["mood"],
+            voice_type=params["voice_type"],
+            steps=steps,
+            cfg=cfg,
+            seed=seed,
+            draft=not audio,
+            timings=job_timings(job)
+        )
+    except Exception as e:  # history is a convenience, never fail the song for it
+        job.log("debug", f"Historique non enregistré: {e}")
+
+# ======================================================
+# UI
+# ======================================================
+# Each section is a fragment: a widget change reruns only its own section.
+# Sections talk through st.session_state (lyrics, sheet, music_params,
+# job_id); a section that changes what another one shows calls st.rerun()
+# for one full run.
 
 # ======================================================
 # UI - LYRICS GENERATION
 # ======================================================
-st.markdown("### ✍️ Génération de Paroles")
+@st.fragment
+def lyrics_generation_section():
+    st.markdown("### ✍️ Génération de Paroles")
 
-col1, col2 = st.columns([3, 1])
+    col1, col2 = st.columns([3, 1])
 
-with col1:
-    user_prompt = st.text_input(
-        "Décris ta chanson",
-        placeholder="ex: une chanson triste sur l'amour perdu..."
-    )
+    with col1:
+        user_prompt = st.text_input(
+            "Décris ta chanson",
+            placeholder="ex: une chanson triste sur l'amour perdu..."
+        )
 
-with col2:
-    generate_lyrics_btn = st.button("🎼 Générer", use_container_width=True)
+    with col2:
+        generate_lyrics_btn = st.button("🎼 Générer", use_container_width=True)
 
-if generate_lyrics_btn and user_prompt:
-    with st.spinner("✍️ Écriture des paroles..."):
-        lyrics = generate_lyrics(user_prompt)
+    col_live, col_count = st.columns(2)
+
+    with col_live:
+        live_lyrics = st.checkbox(
+            "Affichage en direct",
+            value=True,
+            help="Affiche les paroles pendant leur écriture et s'arrête dès la limite de lignes/mots"
+        )
+
+    with col_count:
+        candidate_count = st.number_input(
+            "Propositions",
+            min_value=1,
+            max_value=LYRICS_CANDIDATES_MAX,
+            value=1,
+            help="Plusieurs versions écrites en parallèle; la mieux adaptée est affichée en premier"
+        )
+
+    if generate_lyrics_btn and user_prompt:
+        with st.spinner("✍️ Écriture des paroles..."):
+            st.session_state.lyric_candidates = None
+            if candidate_count > 1:
+                candidates = generate_lyric_candidates(user_prompt, int(candidate_count))
+                st.session_state.lyric_candidates = candidates
+                lyrics = candidates[0]["text"] if candidates else ""
+            elif live_lyrics:
+                preview = st.empty()
+                lyrics = generate_lyrics(user_prompt, on_partial=preview.code)
+                preview.empty()
+            else:
+                lyrics = generate_lyrics(user_prompt)
         if lyrics:
             st.session_state.lyrics = lyrics
             st.session_state.generated = False
-            st.success("✅ Paroles générées!")
+            # The editor lives in another fragment
+            st.rerun()
+
+    candidates = st.session_state.lyric_candidates
+    if candidates:
+        st.caption("Propositions, de la mieux adaptée à la moins adaptée")
+        for number, candidate in enumerate(candidates, 1):
+            status = "✅" if candidate["valid"] else "❌"
+            label = f"Proposition {number} — {candidate['lines']} lignes, {candidate['words']} mots {status}"
+            if number == 1:
+                label += " · meilleure"
+            with st.expander(label):
+                st.code(candidate["text"])
+                if st.button("Utiliser cette proposition", key=f"lyric_candidate_{number}"):
+                    st.session_state.lyrics = candidate["text"]
+                    st.rerun()
 
 # ======================================================
 # UI - LYRICS EDITOR
 # ======================================================
-st.markdown("---")
-st.markdown("### 📝 Paroles")
+@st.fragment
+def lyrics_editor_section():
+    st.markdown("---")
+    st.markdown("### 📝 Paroles")
 
-lyrics_input = st.text_area(
-    "Paroles (modifiables)",
-    value=st.session_state.lyrics or "",
-    height=250,
-    help="Les paroles seront automatiquement formatées pour DiffRhythm2"
-)
+    lyrics_input = st.text_area(
+        "Paroles (modifiables)",
+        value=st.session_state.lyrics or "",
+        height=250,
+        help="Les paroles seront automatiquement formatées pour DiffRhythm2"
+    )
 
-st.session_state.lyrics = lyrics_input
+    st.session_state.lyrics = lyrics_input
 
-# Stats
-if lyrics_input:
-    words = len(lyrics_input.split())
-    lines = len([l for l in lyrics_input.splitlines() if l.strip()])
-    
-    col_stat1, col_stat2, col_stat3 = st.columns(3)
-    with col_stat1:
-        st.metric("Mots", words, delta=f"Max: {MAX_WORDS}")
-    with col_stat2:
-        st.metric("Lignes", lines, delta=f"Max: {MAX_LINES}")
-    with col_stat3:
-        valid = "✅ Valide" if lyrics_are_valid(lyrics_input) else "❌ Invalide"
-        st.metric("Status", valid)
+    # Stats, validity and LRC in one pass; reused by the generate button
+    with span("prepare", level=logging.DEBUG):
+        sheet = analyze_lyrics(lyrics_input)
+    st.session_state.sheet = sheet
+
+    if lyrics_input:
+        col_stat1, col_stat2, col_stat3 = st.columns(3)
+        with col_stat1:
+            st.metric("Mots", sheet.words, delta=f"Max: {MAX_WORDS}")
+        with col_stat2:
+            st.metric("Lignes", sheet.lines, delta=f"Max: {MAX_LINES}")
+        with col_stat3:
+            valid = "✅ Valide" if sheet.valid else "❌ Invalide"
+            st.metric("Status", valid)
 
 # ======================================================
 # UI - MUSIC PARAMETERS
 # ======================================================
-st.markdown("---")
-st.markdown("### 🎚️ Paramètres Musicaux")
+GENRES = ["Pop", "Rock", "Electronic", "Jazz", "Ambient", "Classical", "Hip-Hop", "R&B", "Country", "Folk"]
 
-col_genre, col_mood = st.columns(2)
+@st.fragment
+def music_parameters_section():
+    st.markdown("---")
+    st.markdown("### 🎚️ Paramètres Musicaux")
 
-with col_genre:
-    genre = st.selectbox(
-        "Genre",
-        ["Pop", "Rock", "Electronic", "Jazz", "Ambient", "Classical", "Hip-Hop", "R&B", "Country", "Folk"]
-    )
+    col_genre, col_mood = st.columns(2)
+
+    with col_genre:
+        genre = st.selectbox("Genre", GENRES)
+
+    with col_mood:
+        mood = st.selectbox(
+            "Mood",
+            ["Happy", "Sad", "Calm", "Romantic", "Energetic", "Melancholic", "Dramatic", "Peaceful"]
+        )
 
-with col_mood:
-    mood = st.selectbox(
-        "Mood",
-        ["Happy", "Sad", "Calm", "Romantic", "Energetic", "Melancholic", "Dramatic", "Peaceful"]
+    # NEW: Voice Type Selection
+    st.markdown("#### 🎤 Type de Voix")
+
+    voice_type = st.selectbox(
+        "Choisissez le type de voix",
+        [
+            "Baritone (Voix masculine moyenne)",
+            "Baritenor (Voix masculine medium-haute)",
+            "Bass (Voix masculine grave)",
+            "Tenor (Voix masculine haute)",
+            "Mezzosoprano (Voix féminine moyenne)",
+            "Soprano (Voix féminine haute)",
+            "Contralto (Voix féminine grave)"
+        ],
+        index=0,
+        help="Sélectionnez le registre vocal pour la chanson"
     )
 
-# NEW: Voice Type Selection
-st.markdown("#### 🎤 Type de Voix")
-
-voice_type = st.selectbox(
-    "Choisissez le type de voix",
-    [
-        "Baritone (Voix masculine moyenne)",
-        "Baritenor (Voix masculine medium-haute)",
-        "Bass (Voix masculine grave)",
-        "Tenor (Voix masculine haute)",
-        "Mezzosoprano (Voix féminine moyenne)",
-        "Soprano (Voix féminine haute)",
-        "Contralto (Voix féminine grave)"
-    ],
-    index=0,
-    help="Sélectionnez le registre vocal pour la chanson"
-)
+    # Info box about voice types
+    with st.expander("ℹ️ Guide des Types de Voix"):
+        st.markdown("""
+        **Voix Masculines:**
+        - **Bass (Grave)**: Voix la plus grave, puissante et profonde (E2-E4)
+        - **Baritone (Moyen)**: Voix masculine standard, polyvalente (A2-A4)
+        - **Baritenor (Medium-Haut)**: Entre baritone et tenor, riche (C3-C5)
+        - **Tenor (Aigu)**: Voix masculine la plus haute, brillante (C3-C5)
+        
+        **Voix Féminines:**
+        - **Contralto (Grave)**: Voix féminine la plus grave, rare (F3-F5)
+        - **Mezzosoprano (Moyen)**: Voix féminine standard, chaleureuse (A3-A5)
+        - **Soprano (Aigu)**: Voix féminine la plus haute, claire (C4-C6)
+        """)
 
-# Info box about voice types
-with st.expander("ℹ️ Guide des Types de Voix"):
-    st.markdown("""
-    **Voix Masculines:**
-    - **Bass (Grave)**: Voix la plus grave, puissante et profonde (E2-E4)
-    - **Baritone (Moyen)**: Voix masculine standard, polyvalente (A2-A4)
-    - **Baritenor (Medium-Haut)**: Entre baritone et tenor, riche (C3-C5)
-    - **Tenor (Aigu)**: Voix masculine la plus haute, brillante (C3-C5)
-    
-    **Voix Féminines:**
-    - **Contralto (Grave)**: Voix féminine la plus grave, rare (F3-F5)
-    - **Mezzosoprano (Moyen)**: Voix féminine standard, chaleureuse (A3-A5)
-    - **Soprano (Aigu)**: Voix féminine la plus haute, claire (C4-C6)
-    """)
-
-# Advanced parameters
-with st.expander("⚙️ Paramètres Avancés"):
-    col_steps, col_cfg = st.columns(2)
-    
-    with col_steps:
-        custom_steps = st.slider(
-            "Steps (qualité)",
-            min_value=10,
-            max_value=24,
-            value=SAFE_STEPS,
-            step=2,
-            help="Plus élevé = meilleure qualité mais plus lent"
-        )
-    
-    with col_cfg:
-        custom_cfg = st.slider(
-            "CFG Strength",
-            min_value=0.8,
-            max_value=2.0,
-            value=SAFE_CFG,
-            step=0.1,
-            help="Contrôle l'adhérence au prompt"
+    # Advanced parameters
+    with st.expander("⚙️ Paramètres Avancés"):
+        col_steps, col_cfg = st.columns(2)
+        
+        with col_steps:
+            custom_steps = st.slider(
+                "Steps (qualité)",
+                min_value=10,
+                max_value=24,
+                value=SAFE_STEPS,
+                step=2,
+                help="Plus élevé = meilleure qualité mais plus lent"
+            )
+        
+        with col_cfg:
+            custom_cfg = st.slider(
+                "CFG Strength",
+                min_value=0.8,
+                max_value=2.0,
+                value=SAFE_CFG,
+                step=0.1,
+                help="Contrôle l'adhérence au prompt"
+            )
+        
+        use_custom = st.checkbox("Utiliser paramètres personnalisés", value=False)
+
+        col_seed, col_cache = st.columns(2)
+
+        with col_seed:
+            fixed_seed = st.checkbox(
+                "Seed fixe",
+                value=False,
+                help="Rend la génération reproductible et permet de réutiliser le cache"
+            )
+            seed_value = st.number_input("Seed", min_value=0, max_value=2**31 - 1, value=0, step=1)
+
+        with col_cache:
+            bypass_cache = st.checkbox("Ignorer le cache", value=False)
+            cache_stats = song_cache.stats()
+            st.caption(f"Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+
+        progressive = st.checkbox(
+            "Mode progressif",
+            value=False,
+            help=f"Écoutez d'abord un brouillon rapide ({DRAFT_STEPS} steps), la version finale arrive ensuite"
         )
-    
-    use_custom = st.checkbox("Utiliser paramètres personnalisés", value=False)
-    
-    if use_custom:
-        SAFE_STEPS = custom_steps
-        SAFE_CFG = custom_cfg
 
-st.markdown("---")
+    st.session_state.music_params = {
+        "genre": genre,
+        "mood": mood,
+        "voice_type": voice_type,
+        "steps": custom_steps if use_custom else SAFE_STEPS,
+        "cfg": custom_cfg if use_custom else SAFE_CFG,
+        "seed": int(seed_value) if fixed_seed else None,
+        "use_cache": not bypass_cache,
+        "progressive": progressive,
+    }
 
 # ======================================================
 # UI - MUSIC GENERATION
 # ======================================================
-generate_music_btn = st.button(
-    "🎧 GÉNÉRER LA MUSIQUE",
-    type="primary",
-    use_container_width=True
-)
+def submit_music(sheet, options):
+    """Queue a render of `sheet` with the parameters section's `options`
 
-if generate_music_btn:
-    if not lyrics_are_valid(lyrics_input):
-        st.error("""❌ **Paroles invalides**
-        
-Les paroles doivent:
-- Contenir au moins 10 mots
-- Ne pas dépasser 220 mots
-- Ne pas être vides""")
-    else:
-        # Progress bar
-        progress = st.progress(0)
-        status = st.empty()
-        
-        for i in range(100):
-            time.sleep(0.02)
-            progress.progress(i + 1)
-            if i < 30:
-                status.text("🎵 Préparation du format LRC...")
-            elif i < 60:
-                status.text("🎹 Génération musicale...")
+    The job becomes this session's current job; returns its id, or None when
+    it was not admitted.
+    """
+    lrc = sheet.lrc
+    steps, cfg = options["steps"], options["cfg"]
+    prompt = build_text_prompt(options["genre"], options["mood"], options["voice_type"])
+    eta = eta_model.predict(lrc_line_count(lrc), steps, cfg)
+    eta_draft = eta_model.predict(lrc_line_count(lrc), DRAFT_STEPS, min(DRAFT_CFG, cfg))
+    # Identical render already running: wait for it without taking a worker
+    follow = not options["progressive"] and music_flight.running(
+        request_key(lrc, prompt, steps, cfg, options["seed"]))
+
+    # Generate music with voice type, in the background
+    try:
+        job_id = job_manager.submit(
+            generate_music_safe,
+            params={
+                "user": st.session_state.user_id,
+                "tier": st.session_state.tier,
+                "genre": options["genre"],
+                "mood": options["mood"],
+                "voice_type": options["voice_type"],
+                "lyrics": st.session_state.lyrics,
+                "lrc": lrc,
+                "eta": eta,
+                "eta_draft": eta_draft,
+                # Expected GPU seconds, for shortest-job-first scheduling
+                "cost": eta + eta_draft if options["progressive"] else eta
+            },
+            follow=follow,
+            lrc=lrc,
+            prompt=prompt,
+            steps=steps,
+            cfg=cfg,
+            seed=options["seed"],
+            use_cache=options["use_cache"],
+            progressive=options["progressive"]
+        )
+    except Rejected as e:
+        st.warning(f"⏳ {e}")
+        return None
+
+    st.session_state.job_id = job_id
+    # Shown with the job, which outlives this run
+    job = job_manager.get(job_id)
+    for message in sheet.warnings:
+        job.log("warning", message)
+    return job_id
+
+def show_job(job):
+    """Status of a queued or running job, or its outcome"""
+    # Show generated LRC (debug)
+    with st.expander("Debug: Format LRC Généré"):
+        st.code(job.params["lrc"])
+
+    events = job.events()
+    for level, message in events:
+        if level != "debug":
+            getattr(st, level)(message)
+
+    debug = [message for level, message in events if level == "debug"]
+    if debug:
+        with st.expander("Debug: Réponse API"):
+            for message in debug:
+                st.write(message)
+
+    if job.traceback:
+        with st.expander("Stack Trace Complet"):
+            st.code(job.traceback)
+
+    if not job.done:
+        upstream = job.upstream
+        eta = job.params["eta_draft"] if job.stage == "draft" else job.params["eta"]
+        stage_label = "🎹 Brouillon" if job.stage == "draft" else "🎹 Génération musicale"
+
+        if job.partial:
+            st.markdown("### 🎧 Brouillon")
+            render_audio(job.partial, f"senorix_brouillon.{FILE_TYPE}")
+
+        # Real progress: our queue, upstream queue position, then upstream
+        # progress when the Space reports it, otherwise elapsed time against
+        # the learned ETA
+        if job.state == PENDING:
+            position = job_manager.position(job.id)
+            st.progress(0.0, text=f"⏳ En attente de votre tour: position {position or '?'}")
+        elif job.processing_started_at is None:
+            rank = upstream.get("rank")
+            if rank is not None:
+                status_text = f"⏳ En file d'attente DiffRhythm2: position {rank + 1}/{upstream.get('queue_size') or '?'}"
+                if upstream.get("eta"):
+                    status_text += f" — début dans ~{upstream['eta']:.0f}s"
             else:
-                status.text("🎚️ Finalisation...")
-        
-        # Generate music with voice type
-        with st.spinner("🎧 Composition en cours..."):
-            audio = generate_music_safe(lyrics_input, mood, genre, voice_type)
+                status_text = "🎵 Envoi à DiffRhythm2..."
+            st.progress(0.0, text=status_text)
+        else:
+            elapsed = time.time() - job.processing_started_at
+            fraction = upstream.get("progress")
+            if fraction is None:
+                fraction = min(elapsed / eta, 0.99)
+            remaining = max(0.0, eta - elapsed)
+            st.progress(
+                min(max(fraction, 0.0), 1.0),
+                text=f"{stage_label}... ~{remaining:.0f}s restantes (estimé: {eta:.0f}s)"
+            )
+        st.caption(f"Modèle ETA appris sur {eta_model.samples} générations")
+        st.button(
+            "⛔ Annuler la version finale" if job.partial else "⛔ Annuler",
+            on_click=job_manager.cancel,
+            args=(job.id,)
+        )
+        return
+
+    st.session_state.job_id = None
+    audio = job.result if job.state == SUCCEEDED else None
+    genre_used = job.params["genre"]
+    voice_used = job.params["voice_type"]
+
+    if audio:
+        st.success("🎉 **Musique générée avec succès!**")
         
-        progress.empty()
-        status.empty()
+        st.markdown("### 🎧 Écouter")
+        render_audio(
+            audio,
+            f"senorix_{genre_used.lower()}_{voice_used.split()[0].lower()}_{int(time.time())}.{FILE_TYPE}"
+        )
         
-        if audio:
-            st.success("🎉 **Musique générée avec succès!**")
-            
-            st.markdown("### 🎧 Écouter")
-            st.audio(audio)
-            
-            st.session_state.audio = audio
-            st.session_state.generated = True
-            
-            # Download button
-            try:
-                with open(audio, "rb") as f:
-                    st.download_button(
-                        label=f"⬇️ Télécharger {FILE_TYPE.upper()}",
-                        data=f.read(),
-                        file_name=f"senorix_{genre.lower()}_{voice_type.split()[0].lower()}_{int(time.time())}.{FILE_TYPE}",
-                        mime=f"audio/{FILE_TYPE}",
-                        use_container_width=True
-                    )
-            except Exception as e:
-                st.warning(f"⚠️ Download non disponible: {e}")
+        st.session_state.generated = True
+    elif job.partial:
+        # Final render cancelled or failed: the draft is still a song
+        if job.state == CANCELLED:
+            st.info("⛔ Version finale annulée — brouillon conservé")
         else:
-            st.error("""❌ **Génération échouée**
-            
+            st.warning("Version finale échouée — brouillon conservé")
+        render_audio(job.partial, f"senorix_brouillon.{FILE_TYPE}")
+        st.session_state.generated = True
+    elif job.state == CANCELLED:
+        st.warning("⛔ Génération annulée")
+    else:
+        if job.error:
+            st.error(f"Erreur spécifique: {job.error}")
+        st.error("""❌ **Génération échouée**
+        
 **Vérifiez:**
 1. Le format LRC dans l'expander debug
 2. Les erreurs spécifiques affichées ci-dessus
@@ -467,23 +934,135 @@ Les paroles doivent:
 - Utiliser des paramètres plus bas
 - Attendre quelques minutes si GPU occupé""")
 
-# Show last generation
-if st.session_state.audio and not generate_music_btn:
+def music_generation_section():
     st.markdown("---")
-    st.markdown("### 🎵 Dernière Génération")
-    st.audio(st.session_state.audio)
-    
-    try:
-        with open(st.session_state.audio, "rb") as f:
-            st.download_button(
-                label=f"⬇️ Télécharger {FILE_TYPE.upper()}",
-                data=f.read(),
-                file_name=f"senorix_song.{FILE_TYPE}",
-                mime=f"audio/{FILE_TYPE}",
-                use_container_width=True
+
+    job = job_manager.get(st.session_state.job_id) if st.session_state.job_id else None
+
+    # Polling started on a full run; one more full run stops the timer and
+    # shows the outcome
+    if st.session_state.polling and (job is None or job.done):
+        st.session_state.polling = False
+        st.rerun()
+
+    generate_music_btn = st.button(
+        "🎧 GÉNÉRER LA MUSIQUE",
+        type="primary",
+        use_container_width=True,
+        disabled=job is not None and not job.done
+    )
+
+    if generate_music_btn:
+        sheet = st.session_state.sheet or analyze_lyrics(st.session_state.lyrics or "")
+        if not sheet.valid:
+            st.error("""❌ **Paroles invalides**
+            
+Les paroles doivent:
+- Contenir au moins 10 mots
+- Ne pas dépasser 220 mots
+- Ne pas être vides""")
+        else:
+            options = st.session_state.music_params
+            previous = find_previous_render(sheet, options)
+            if previous is not None:
+                when = time.strftime("%d/%m/%Y %H:%M", time.localtime(previous["created_at"]))
+                st.info(f"♻️ Déjà générée le {when} avec ces paroles et ce seed")
+                render_audio(previous["audio"], f"senorix_song.{FILE_TYPE}")
+            elif submit_music(sheet, options):
+                # Full run, so this section comes back with a polling timer
+                st.rerun()
+
+    if job is not None:
+        show_job(job)
+
+def find_previous_render(sheet, options):
+    """History entry that already holds this exact song, or None
+
+    Only for a fixed seed: with a random seed, asking again means asking for
+    a different song.
+    """
+    if options["seed"] is None or not options["use_cache"]:
+        return None
+    prompt = build_text_prompt(options["genre"], options["mood"], options["voice_type"])
+    return history.find(request_key(sheet.lrc, prompt, options["steps"], options["cfg"], options["seed"]))
+
+# ======================================================
+# UI - HISTORY
+# ======================================================
+def reset_history_pages():
+    st.session_state.history_cursors = None
+
+@st.fragment
+def history_section():
+    st.markdown("---")
+    st.markdown("### 🕘 Historique")
+
+    user = st.session_state.user_id
+    if not history.count(user):
+        st.caption("Aucune génération pour l'instant")
+        return
+
+    genre_filter = st.selectbox(
+        "Genre", ["Tous"] + GENRES, key="history_genre", on_change=reset_history_pages
+    )
+    # Cursors of the pages seen so far; the last one is the current page
+    cursors = st.session_state.history_cursors or [None]
+    entries, next_cursor = history.page(
+        user,
+        limit=HISTORY_PAGE_SIZE,
+        before=cursors[-1],
+        genre=None if genre_filter == "Tous" else genre_filter
+    )
+    if not entries:
+        st.caption("Aucune génération pour ce genre")
+
+    for entry in entries:
+        when = time.strftime("%d/%m/%Y %H:%M", time.localtime(entry["created_at"]))
+        label = f"{when} — {entry['genre']} · {entry['mood']} · {(entry['voice_type'] or '').split(' ')[0]}"
+        if entry["draft"]:
+            label += " (brouillon)"
+        with st.expander(label):
+            if entry["audio"] and os.path.exists(entry["audio"]):
+                render_audio(entry["audio"], f"senorix_{entry['id']}.{FILE_TYPE}")
+            else:
+                st.caption("Fichier audio expiré")
+            seed = entry["seed"] if entry["seed"] is not None else "aléatoire"
+            render_seconds = entry["timings"].get("render")
+            st.caption(
+                f"Steps: {entry['steps']} · CFG: {entry['cfg']} · Seed: {seed}"
+                + (f" · Rendu: {render_seconds:.0f}s" if render_seconds is not None else "")
             )
-    except:
-        pass
+            if st.button("↩️ Réutiliser ces paroles", key=f"history_reuse_{entry['id']}"):
+                st.session_state.lyrics = entry["lyrics"]
+                # The editor lives in another fragment
+                st.rerun()
+
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if st.button("⬅️ Plus récentes", disabled=len(cursors) == 1, use_container_width=True):
+            st.session_state.history_cursors = cursors[:-1]
+            st.rerun(scope="fragment")
+    with col_next:
+        if st.button("Plus anciennes ➡️", disabled=next_cursor is None, use_container_width=True):
+            st.session_state.history_cursors = cursors + [next_cursor]
+            st.rerun(scope="fragment")
+
+lyrics_generation_section()
+lyrics_editor_section()
+music_parameters_section()
+
+# ======================================================
+# JOB POLLING
+# ======================================================
+# Only the generation section reruns while a background job is in flight,
+# so its status stays current without re-executing the whole page
+job = job_manager.get(st.session_state.job_id) if st.session_state.job_id else None
+st.session_state.polling = job is not None and not job.done
+st.fragment(
+    music_generation_section,
+    run_every=JOB_POLL_INTERVAL if st.session_state.polling else None
+)()
+history_section()
 
 # ======================================================
 # FOOTER
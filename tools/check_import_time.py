@@ -0,0 +1,84 @@
+"""Import-time budget for the senorix core
+
+Imports the core modules in a fresh interpreter with `-X importtime`, fails if
+their cumulative import time exceeds the budget or if a heavy SDK was pulled
+in eagerly. Run from the repository root:
+
+    python tools/check_import_time.py --budget-ms 150
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+CORE_MODULES = [
+    "senorix",
+    "senorix.lyrics",
+    "senorix.generation",
+    "senorix.music",
+    "senorix.jobs",
+    "senorix.clients",
+    "senorix.batch",
+]
+
+# Must only load when a client is actually built
+HEAVY_MODULES = ["cohere", "gradio_client", "httpx", "streamlit"]
+
+PROBE = """
+import sys
+{imports}
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print("HEAVY=" + ",".join(heavy))
+"""
+
+
+def measure():
+    """Return ({module: cumulative_us}, total_us, [heavy modules loaded])"""
+    code = PROBE.format(
+        imports="\n".join(f"import {name}" for name in CORE_MODULES),
+        heavy=HEAVY_MODULES,
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=root, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    top_level_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line.split("|")
+        name = raw_name.strip()
+        cumulative[name] = int(cumulative_us)
+        if len(raw_name) - len(raw_name.lstrip()) == 1:  # not nested
+            top_level_us += int(cumulative_us)
+    heavy = []
+    for line in proc.stdout.splitlines():
+        if line.startswith("HEAVY="):
+            heavy = [name for name in line[len("HEAVY="):].split(",") if name]
+    return cumulative, top_level_us, heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    args = parser.parse_args(argv)
+
+    cumulative, total_us, heavy = measure()
+    for name in CORE_MODULES:
+        print(f"{name:24s} {cumulative.get(name, 0) / 1000:8.1f} ms")
+    print(f"{'total':24s} {total_us / 1000:8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if total_us / 1000 > args.budget_ms:
+        print("FAIL: import-time budget exceeded")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())